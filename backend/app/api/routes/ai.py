@@ -1,12 +1,36 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request
 from app.database.ai_schema import AIRequest, AIResponse
+from app.services.admission import QueueFullError, llm_admission
+from app.services.fallback_service import create_fallback_events
 from app.services.openai_service import AIService
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 ai_service = AIService()
 
+
+def _fallback_event(text: str) -> AIResponse:
+    """First event of the rule-based schedule, shaped as an AIResponse"""
+    event = create_fallback_events(text, datetime.now()).events[0]
+    return AIResponse(
+        title=event.title,
+        date=event.date,
+        start_time=event.start_time,
+        end_time=event.end_time,
+        description=event.description,
+        source="fallback",
+    )
+
+
+async def _generate(text: str, user: str) -> AIResponse:
+    async with llm_admission.slot(user):
+        return await ai_service.generate_event_from_text(text)
+
+
 @router.post("/generate", response_model=AIResponse)
-async def generate_event(data: AIRequest):
+async def generate_event(data: AIRequest, request: Request):
     """
     Generate a structured event from natural language using AI.
     Example Input:
@@ -14,11 +38,30 @@ async def generate_event(data: AIRequest):
 
     Returns:
         A formal event object (title, date, start_time, end_time, description)
+
+    With "deadline_ms", a rule-based event is returned if the model has not
+    answered in time (or the LLM queue is full); "source" tells which one
+    was used. Without it a full LLM queue gives 429 with Retry-After.
     """
 
+    user = request.client.host if request.client else ""
     try:
-        event = await ai_service.generate_event_from_text(data.user_text)
-        return event
+        if not data.deadline_ms:
+            return await _generate(data.user_text, user)
+
+        fallback = _fallback_event(data.user_text)
+        task = asyncio.ensure_future(_generate(data.user_text, user))
+        done, _ = await asyncio.wait({task}, timeout=data.deadline_ms / 1000)
+        if task in done and task.exception() is None:
+            return task.result()
+        task.cancel()
+        return fallback
 
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
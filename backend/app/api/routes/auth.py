@@ -19,7 +19,11 @@ def register(payload: UserCreate):
     email=payload.email,
     password=payload.password,  # NOTE: plaintext for demo; hash in production
   )
-  db.create_user(user)
+  try:
+    db.create_user(user)
+  except ValueError:
+    # Lost a race with a concurrent registration for the same email
+    raise HTTPException(status_code=400, detail="Email already registered")
 
   token = f"demo-token-{user.id}"
   return TokenResponse(token=token, user=UserPublic(**user.model_dump()))
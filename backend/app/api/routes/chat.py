@@ -1,14 +1,51 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+import asyncio
 import json
 import os
+import re
+from contextlib import aclosing
 from datetime import datetime, timedelta
-import requests
+from typing import AsyncIterator, Optional
+import httpx
 
-from app.database.schemas import ScheduleRequest, ScheduleResponse, EventItem
+from app.database.connection import db
+from app.database.schemas import (
+    BatchScheduleRequest,
+    BatchScheduleResponse,
+    EventItem,
+    ScheduleJob,
+    ScheduleJobRequest,
+    ScheduleRequest,
+    ScheduleResponse,
+)
+from app.services.admission import BATCH, INTERACTIVE, QueueFullError, llm_admission
+from app.services.events_service import EventsService
+from app.services.fallback_service import create_fallback_events
+from app.services.jobs import Job, JobManager
+from app.services.llm_router import CallableProvider, GeminiProvider, LLMRouter, OpenAIProvider
+from app.services.ollama_service import model_registry, ollama_client
+from app.services.schedule_cache import schedule_cache, schedule_cache_key
+from app.services.semantic_cache import semantic_cache
+from app.services.single_flight import SingleFlight
+from app.utils.config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    GEMINI_MODEL,
+    JOBS_SSE_KEEPALIVE_SECONDS,
+    OLLAMA_BASE_URL,
+    OLLAMA_MAX_PREDICT,
+    OLLAMA_PREDICT_BASE,
+    OLLAMA_PREDICT_MIN_EVENTS,
+    OLLAMA_PREDICT_PER_EVENT,
+    OPENAI_MODEL,
+)
+from app.utils.ical import build_vevent
+from app.utils.json_stream import JSONArrayStreamParser
 
 # Try to import OpenAI (optional)
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
@@ -22,222 +59,120 @@ except ImportError:
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# Initialize clients
-_openai_client = None
-_gemini_model = None
-OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+generation_flights = SingleFlight()
+events_service = EventsService(db)
 
-def get_gemini_model():
-    """Get Google Gemini model (free tier available)"""
-    global _gemini_model
-    if not GEMINI_AVAILABLE:
-        return None
-    if _gemini_model is None:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            _gemini_model = genai.GenerativeModel('gemini-pro')
-    return _gemini_model
-
-def call_ollama(prompt: str, model: str = None) -> str:
+
+async def call_ollama(
+    prompt: str, model: str = None, system: str = None, max_tokens: int = None
+) -> str:
     """Call Ollama local LLM (completely free, runs locally)
-    Tries multiple models in order of preference.
+    Tries installed models in order of preference, skipping any whose
+    circuit breaker is open. Returns None straight away while Ollama itself
+    is known to be down, so callers drop to the fallback without waiting.
+    The reply is constrained to EVENT_LIST_SCHEMA.
     """
-    # Try models in order of preference (best quality first)
-    models_to_try = model and [model] or ["llama3.2", "llama3", "mistral", "codellama", "llama2"]
+    if not model_registry.server_breaker.allow():
+        print("Ollama marked unavailable (circuit open), skipping LLM call")
+        return None
+
+    models_to_try = [model] if model else model_registry.candidates()
     
     for model_name in models_to_try:
+        breaker = model_registry.breaker(model_name)
+        if not breaker.allow():
+            print(f"Skipping Ollama model {model_name} (circuit open)")
+            continue
         try:
             print(f"Trying Ollama model: {model_name}")
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.3,  # Lower temperature for more structured output
-                        "num_predict": 2000  # Max tokens
-                    }
+            response = await ollama_client.generate(
+                model_name,
+                prompt,
+                options={
+                    "temperature": 0.3,  # Lower temperature for more structured output
+                    "num_predict": max_tokens or OLLAMA_MAX_PREDICT  # Max tokens
                 },
-                timeout=90  # Longer timeout for larger models
+                system=system,
+                format=EVENT_LIST_SCHEMA,
             )
+            model_registry.server_breaker.record_success()
             if response.status_code == 200:
                 result = response.json().get("response", "")
                 if result:
+                    breaker.record_success()
                     print(f"✅ Successfully got response from Ollama ({model_name})")
                     return result
+            elif response.status_code == 404:
+                model_registry.mark_missing(model_name)
             else:
                 print(f"Ollama model {model_name} returned status {response.status_code}")
-        except requests.exceptions.ConnectionError:
-            print(f"Ollama not running or model {model_name} not available. Make sure Ollama is installed and running.")
+            breaker.record_failure()
+        except httpx.ConnectError:
+            model_registry.server_breaker.record_failure()
+            print(f"Ollama not running at {OLLAMA_BASE_URL}. Make sure Ollama is installed and running.")
             return None  # Don't try other models if Ollama isn't running
         except Exception as e:
+            breaker.record_failure()
             print(f"Error with Ollama model {model_name}: {e}")
             continue  # Try next model
     
     return None
 
 
-def _create_fallback_events(prompt: str, today: datetime) -> ScheduleResponse:
-    """
-    Smart fallback that understands natural language and creates structured events.
-    Works without any AI APIs - uses pattern matching and intelligent parsing.
+async def stream_ollama(
+    prompt: str, model: str = None, system: str = None, max_tokens: int = None
+) -> AsyncIterator[str]:
+    """Streaming counterpart of call_ollama; yields response text fragments.
+
+    A model that fails before producing any output is skipped like in
+    call_ollama. Once output has started, an error simply ends the stream.
     """
-    prompt_lower = prompt.lower()
-    events = []
-    current_time = 6  # Start at 6 AM for morning routines
-    
-    # Helper to add event with auto-incrementing time
-    def add_event(title, start_hour, start_min, duration_min=30, location="", desc=""):
-        start_time_str = f"{start_hour:02d}:{start_min:02d}"
-        end_hour = start_hour + (start_min + duration_min) // 60
-        end_min = (start_min + duration_min) % 60
-        end_time_str = f"{end_hour:02d}:{end_min:02d}"
-        events.append(EventItem(
-            title=title,
-            date=today.strftime('%Y-%m-%d'),
-            start_time=start_time_str,
-            end_time=end_time_str,
-            location=location,
-            description=desc or title
-        ))
-        return end_hour, end_min
-    
-    # Parse time mentions
-    import re
-    time_patterns = {
-        r'(\d{1,2})\s*(am|pm|:|\s)': None,  # Will extract in code
-        r'morning': (6, 0),
-        r'afternoon': (13, 0),
-        r'evening': (17, 0),
-        r'night': (20, 0),
-        r'early\s*morning': (5, 0),
-        r'late\s*night': (22, 0),
-    }
-    
-    # Extract explicit times
-    time_matches = re.findall(r'(\d{1,2}):?(\d{2})?\s*(am|pm)?', prompt_lower)
-    parsed_times = []
-    for match in time_matches:
-        hour = int(match[0])
-        minute = int(match[1]) if match[1] else 0
-        if match[2] == 'pm' and hour < 12:
-            hour += 12
-        elif match[2] == 'am' and hour == 12:
-            hour = 0
-        parsed_times.append((hour, minute))
-    
-    # MORNING ROUTINE DETECTION
-    if "wake" in prompt_lower or ("morning" in prompt_lower and "routine" in prompt_lower):
-        hour, minute = add_event("Wake Up", 6, 0, 15, "Home", "Morning wake up")
-        current_time = hour
-        current_min = minute
-    
-    # PRAYER DETECTION - Smart prayer parsing
-    prayer_keywords = ["pray", "prayer", "salah", "salat", "namaz"]
-    has_prayer = any(kw in prompt_lower for kw in prayer_keywords)
-    
-    if has_prayer:
-        # Check for "all prayers" or similar
-        if any(word in prompt_lower for word in ["all", "every", "all of", "each"]):
-            # All 5 prayers
-            prayers = [
-                ("Fajr Prayer", 5, 30, 30),
-                ("Dhuhr Prayer", 12, 30, 30),
-                ("Asr Prayer", 15, 30, 30),
-                ("Maghrib Prayer", 18, 30, 30),
-                ("Isha Prayer", 20, 0, 30),
-            ]
-            for title, h, m, d in prayers:
-                add_event(title, h, m, d, "", "Prayer time")
-        else:
-            # Single prayer - infer from time or use default
-            if "fajr" in prompt_lower or "dawn" in prompt_lower:
-                add_event("Fajr Prayer", 5, 30, 30)
-            elif "dhuhr" in prompt_lower or "zuhr" in prompt_lower or "noon" in prompt_lower:
-                add_event("Dhuhr Prayer", 12, 30, 30)
-            elif "asr" in prompt_lower or "afternoon" in prompt_lower:
-                add_event("Asr Prayer", 15, 30, 30)
-            elif "maghrib" in prompt_lower or "sunset" in prompt_lower:
-                add_event("Maghrib Prayer", 18, 30, 30)
-            elif "isha" in prompt_lower or "night" in prompt_lower:
-                add_event("Isha Prayer", 20, 0, 30)
-            else:
-                # Default prayer time
-                add_event("Prayer", 12, 0, 30)
-    
-    # SEQUENTIAL ACTIVITY PARSING
-    # Look for "and", "then", "after" to chain events
-    connectors = [" and ", " then ", " after ", ", then ", ", and ", " followed by "]
-    has_connectors = any(conn in prompt_lower for conn in connectors)
-    
-    # BREAKFAST/MEAL
-    if any(word in prompt_lower for word in ["breakfast", "eat", "meal", "food", "lunch", "dinner"]):
-        if "breakfast" in prompt_lower:
-            add_event("Breakfast", 8, 0, 30, "Kitchen", "Morning meal")
-        elif "lunch" in prompt_lower:
-            add_event("Lunch", 13, 0, 45, "", "Midday meal")
-        elif "dinner" in prompt_lower:
-            add_event("Dinner", 19, 0, 60, "", "Evening meal")
-        else:
-            add_event("Meal", 8, 0, 30, "Kitchen", "Meal time")
-    
-    # STUDY/LEARNING
-    if any(word in prompt_lower for word in ["study", "learn", "homework", "read", "research"]):
-        # Try to extract duration
-        duration = 120  # Default 2 hours
-        if "hour" in prompt_lower:
-            hour_match = re.search(r'(\d+)\s*hour', prompt_lower)
-            if hour_match:
-                duration = int(hour_match.group(1)) * 60
-        
-        # Try to extract time
-        if parsed_times:
-            h, m = parsed_times[0]
-            add_event("Study Session", h, m, duration, "", "Study time")
-        else:
-            add_event("Study Session", 9, 0, duration, "", "Study time")
-    
-    # EXERCISE/WORKOUT
-    if any(word in prompt_lower for word in ["exercise", "workout", "gym", "run", "jog", "fitness"]):
-        add_event("Exercise", 7, 0, 60, "Gym", "Physical activity")
-    
-    # SHOWER/BATH
-    if any(word in prompt_lower for word in ["shower", "bath", "wash"]):
-        add_event("Shower", 7, 30, 20, "Bathroom", "Personal hygiene")
-    
-    # WORK
-    if any(word in prompt_lower for word in ["work", "job", "office", "meeting"]):
-        if parsed_times:
-            h, m = parsed_times[0]
-            add_event("Work", h, m, 480, "Office", "Work time")  # 8 hours
-        else:
-            add_event("Work", 9, 0, 480, "Office", "Work time")
-    
-    # If no specific patterns matched, create intelligent events from keywords
-    if not events:
-        # Try to extract main activity
-        words = prompt_lower.split()
-        # Remove common words
-        stop_words = {"i", "want", "to", "in", "the", "and", "a", "an", "at", "on", "for", "with"}
-        meaningful_words = [w for w in words if w not in stop_words and len(w) > 2]
-        
-        if meaningful_words:
-            title = " ".join(meaningful_words[:4]).title()
-            add_event(title, 12, 0, 60, "", prompt)
-        else:
-            # Last resort
-            title = prompt[:50] if len(prompt) > 50 else prompt
-            add_event(title, 12, 0, 60, "", prompt)
-    
-    # Sort events by time
-    events.sort(key=lambda e: (e.date, e.start_time))
-    
-    return ScheduleResponse(
-        events=events,
-        summary=f"✅ Created {len(events)} event(s) using smart fallback mode (no AI needed)"
-    )
+    if not model_registry.server_breaker.allow():
+        print("Ollama marked unavailable (circuit open), skipping LLM call")
+        return
+
+    models_to_try = [model] if model else model_registry.candidates()
+
+    for model_name in models_to_try:
+        breaker = model_registry.breaker(model_name)
+        if not breaker.allow():
+            continue
+        started = False
+        try:
+            print(f"Streaming from Ollama model: {model_name}")
+            async for fragment in ollama_client.generate_stream(
+                model_name,
+                prompt,
+                options={"temperature": 0.3, "num_predict": max_tokens or OLLAMA_MAX_PREDICT},
+                system=system,
+                format=EVENT_LIST_SCHEMA,
+            ):
+                started = True
+                yield fragment
+            model_registry.server_breaker.record_success()
+            if started:
+                breaker.record_success()
+                return
+            breaker.record_failure()
+        except httpx.ConnectError:
+            model_registry.server_breaker.record_failure()
+            print(f"Ollama not running at {OLLAMA_BASE_URL}. Make sure Ollama is installed and running.")
+            return
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                model_registry.mark_missing(model_name)
+            breaker.record_failure()
+        except Exception as e:
+            breaker.record_failure()
+            print(f"Error streaming from Ollama model {model_name}: {e}")
+            if started:
+                return
+
+
+def _create_fallback_events(prompt: str, today: datetime) -> ScheduleResponse:
+    """Rule-based schedule used when no AI provider answered"""
+    return create_fallback_events(prompt, today)
+
 
 def is_valid_openai_key(api_key: str) -> bool:
     """Check if the API key looks like a valid OpenAI key (starts with 'sk-')"""
@@ -246,33 +181,31 @@ def is_valid_openai_key(api_key: str) -> bool:
     # OpenAI keys start with "sk-", Gemini keys start with "AIza"
     return api_key.strip().startswith("sk-")
 
-def get_openai_client():
-    global _openai_client
-    if not OPENAI_AVAILABLE:
-        return None
-    if _openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and is_valid_openai_key(api_key):
-            _openai_client = OpenAI(api_key=api_key)
-        else:
-            # Invalid key format, don't create client
-            return None
-    return _openai_client
+def _build_providers() -> list:
+    """Ollama always; OpenAI and Gemini when their SDK and API key are present"""
+    providers = [CallableProvider("ollama", call_ollama)]
+    openai_key = os.getenv("OPENAI_API_KEY")
+    if OPENAI_AVAILABLE and is_valid_openai_key(openai_key):
+        providers.append(OpenAIProvider(
+            AsyncOpenAI(api_key=openai_key.strip()),
+            model=OPENAI_MODEL,
+            temperature=0.3,
+            max_tokens=2000,
+        ))
+    gemini_key = os.getenv("GEMINI_API_KEY")
+    if GEMINI_AVAILABLE and gemini_key:
+        genai.configure(api_key=gemini_key)
+        providers.append(GeminiProvider(genai.GenerativeModel(GEMINI_MODEL)))
+    return providers
 
-def _build_ai_prompt(user_prompt: str, today: datetime, tomorrow: datetime) -> str:
-    """Build the AI prompt for event generation"""
-    today_str = today.strftime('%Y-%m-%d')
-    tomorrow_str = tomorrow.strftime('%Y-%m-%d')
-    weekday = today.strftime('%A')
-    
-    return f"""You are an intelligent calendar assistant that understands natural language and creates well-organized calendar events.
 
-USER REQUEST: "{user_prompt}"
+llm_router = LLMRouter(_build_providers())
 
-CONTEXT:
-- Today is {weekday}, {today_str}
-- Tomorrow is {tomorrow_str}
-- Current time context: Use today's date unless the user specifies otherwise (e.g., "tomorrow", "Monday", "next week")
+
+# Static instructions, sent as Ollama's "system" prompt. Keeping them
+# byte-identical across requests (dates and the user's text go in the
+# per-request prompt) lets the loaded model reuse this prefix.
+SYSTEM_PROMPT = """You are an intelligent calendar assistant that understands natural language and creates well-organized calendar events.
 
 YOUR TASK:
 Carefully analyze the user's request and break it down into logical, sequential calendar events. Understand the intent behind their words.
@@ -312,38 +245,54 @@ OUTPUT FORMAT:
 Return ONLY a valid JSON array. No markdown, no explanations, just JSON.
 
 [
-  {{"title": "Event Title", "date": "YYYY-MM-DD", "start_time": "HH:MM", "end_time": "HH:MM", "location": "", "description": "Description"}},
-  {{"title": "Next Event", "date": "YYYY-MM-DD", "start_time": "HH:MM", "end_time": "HH:MM", "location": "", "description": "Description"}}
+  {"title": "Event Title", "date": "YYYY-MM-DD", "start_time": "HH:MM", "end_time": "HH:MM", "location": "", "description": "Description"},
+  {"title": "Next Event", "date": "YYYY-MM-DD", "start_time": "HH:MM", "end_time": "HH:MM", "location": "", "description": "Description"}
 ]
+"""
+
+# Ollama "format": the reply must be a JSON array of EventItem objects
+EVENT_LIST_SCHEMA = {"type": "array", "items": EventItem.model_json_schema()}
+
+_CLAUSE_RE = re.compile(r",|;|\band\b|\bthen\b|\bafter\b")
+
+
+def _build_ai_prompt(user_prompt: str, today: datetime, tomorrow: datetime) -> str:
+    """Per-request part of the AI prompt; the instructions are SYSTEM_PROMPT"""
+    today_str = today.strftime('%Y-%m-%d')
+    tomorrow_str = tomorrow.strftime('%Y-%m-%d')
+    weekday = today.strftime('%A')
+    
+    return f"""CONTEXT:
+- Today is {weekday}, {today_str}
+- Tomorrow is {tomorrow_str}
+- Current time context: Use today's date unless the user specifies otherwise (e.g., "tomorrow", "Monday", "next week")
+
+USER REQUEST: "{user_prompt}"
 
 Now analyze the user's request and create the events:"""
 
+
+def _num_predict(user_prompt: str, today: datetime) -> int:
+    """Reply token budget sized to the number of events the request implies"""
+    expected = max(
+        OLLAMA_PREDICT_MIN_EVENTS,
+        len(_create_fallback_events(user_prompt, today).events),
+        1 + len(_CLAUSE_RE.findall(user_prompt.lower())),
+    )
+    if "week" in user_prompt.lower():
+        expected *= 7
+    return min(OLLAMA_MAX_PREDICT, OLLAMA_PREDICT_BASE + OLLAMA_PREDICT_PER_EVENT * expected)
+
 def _parse_ai_response(content: str, today: datetime) -> list:
     """Parse AI response and extract events"""
-    # Clean up the response (remove markdown code blocks if present)
-    if content.startswith("```json"):
-        content = content[7:]
-    if content.startswith("```"):
-        content = content[3:]
-    if content.endswith("```"):
-        content = content[:-3]
-    content = content.strip()
-    
-    # Parse JSON
-    events_data = None
+    # Constrained (format=EVENT_LIST_SCHEMA) replies are plain JSON
     try:
         events_data = json.loads(content)
-    except json.JSONDecodeError as e:
-        # Fallback: try to extract JSON from the response
-        import re
-        json_match = re.search(r'\[.*\]', content, re.DOTALL)
-        if json_match:
-            try:
-                events_data = json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                return None
-        else:
-            return None
+    except json.JSONDecodeError:
+        # Otherwise salvage every complete object of the first array, which
+        # skips markdown fences and prose and survives a reply cut off by
+        # the token budget
+        events_data = JSONArrayStreamParser().feed(content)
     
     if not isinstance(events_data, list):
         return None
@@ -351,54 +300,242 @@ def _parse_ai_response(content: str, today: datetime) -> list:
     # Convert to EventItem objects
     events = []
     for event_data in events_data:
-        try:
-            event = EventItem(
-                title=event_data.get("title", "Untitled Event"),
-                date=event_data.get("date", today.strftime('%Y-%m-%d')),
-                start_time=event_data.get("start_time", "12:00"),
-                end_time=event_data.get("end_time", "13:00"),
-                location=event_data.get("location", ""),
-                description=event_data.get("description", ""),
-            )
-            events.append(event)
-        except Exception:
+        if not isinstance(event_data, dict):
             continue
+        event = _to_event_item(event_data, today)
+        if event is not None:
+            events.append(event)
     
     return events if events else None
 
 
+def _to_event_item(event_data: dict, today: datetime) -> EventItem:
+    """Build an EventItem from one decoded object, or None if it is invalid"""
+    try:
+        return EventItem(
+            title=event_data.get("title", "Untitled Event"),
+            date=event_data.get("date", today.strftime('%Y-%m-%d')),
+            start_time=event_data.get("start_time", "12:00"),
+            end_time=event_data.get("end_time", "13:00"),
+            location=event_data.get("location", ""),
+            description=event_data.get("description", ""),
+        )
+    except Exception:
+        return None
+
+
+_PROVIDER_LABELS = {
+    "ollama": "Ollama (local, free)",
+    "openai": "OpenAI",
+    "gemini": "Google Gemini",
+}
+
+
+async def _generate_with_llm(user_prompt: str, today: datetime) -> ScheduleResponse:
+    """One LLM generation through the provider router; None when no provider
+    gave a parseable answer"""
+    tomorrow = today + timedelta(days=1)
+    prompt = _build_ai_prompt(user_prompt, today, tomorrow)
+
+    def parse(content: str):
+        try:
+            return _parse_ai_response(content, today)
+        except Exception as parse_error:
+            print(f"LLM parsing error: {parse_error}")
+            return None
+
+    routed = await llm_router.complete(
+        prompt, parse, system=SYSTEM_PROMPT, max_tokens=_num_predict(user_prompt, today)
+    )
+    if routed is None:
+        return None
+    events_data = routed.value
+    label = _PROVIDER_LABELS.get(routed.provider, routed.provider)
+    return ScheduleResponse(
+        events=events_data,
+        summary=f"✅ Generated {len(events_data)} event(s) using {label}",
+        source=routed.provider,
+    )
+
+
+# flight keys whose generation holds an LLM slot rather than a queue place
+_admitted_flights = set()
+
+
+def _flight_key(user_prompt: str, today: datetime, priority: int):
+    # per priority class, so an interactive caller never waits behind a
+    # batch-priority leader or shares its queue rejections
+    return schedule_cache_key(user_prompt, today), priority
+
+
+async def _generate_and_cache(
+    user_prompt: str, today: datetime, user: str, priority: int
+) -> ScheduleResponse:
+    key = _flight_key(user_prompt, today, priority)
+    async with llm_admission.slot(user, priority):
+        _admitted_flights.add(key)
+        try:
+            result = await _generate_with_llm(user_prompt, today)
+        finally:
+            _admitted_flights.discard(key)
+    if result is not None:
+        schedule_cache.put(user_prompt, today, result)
+        await semantic_cache.put(user_prompt, today, result)
+    return result
+
+
+def _exact_cached(user_prompt: str, today: datetime) -> ScheduleResponse:
+    cached = schedule_cache.get(user_prompt, today)
+    if cached is not None:
+        return cached.model_copy(update={"source": "cache"})
+    return None
+
+
+async def _semantic_cached(user_prompt: str, today: datetime) -> ScheduleResponse:
+    """Semantic cache hit moved to ``today``, else None; may wait on an embedding"""
+    similar = await semantic_cache.get(user_prompt, today)
+    if similar is not None:
+        # the next identical prompt is answered without embedding it again
+        schedule_cache.put(user_prompt, today, similar)
+        return similar.model_copy(update={"source": "semantic_cache"})
+    return None
+
+
+async def _cached_schedule(user_prompt: str, today: datetime) -> ScheduleResponse:
+    """Exact-match cache hit, else a semantic one moved to ``today``, else None"""
+    return _exact_cached(user_prompt, today) or await _semantic_cached(user_prompt, today)
+
+
+async def generate_schedule_response(
+    user_prompt: str, today: datetime = None, user: str = "", priority: int = INTERACTIVE
+) -> ScheduleResponse:
+    """Cached LLM result, else a fresh generation, else the rule-based fallback.
+
+    The cache answers identical prompts and, through the semantic cache,
+    differently worded ones that mean the same thing. Only LLM results are
+    cached so a recovered Ollama is used again at once.
+    Fresh generations go through the LLM admission queue as ``user`` and
+    raise QueueFullError when it is full.
+    """
+    today = today or datetime.now()
+
+    cached = await _cached_schedule(user_prompt, today)
+    if cached is not None:
+        return cached
+
+    # Concurrent identical prompts share one generation
+    result = await generation_flights.do(
+        _flight_key(user_prompt, today, priority),
+        lambda: _generate_and_cache(user_prompt, today, user, priority),
+    )
+    if result is not None:
+        return result
+
+    # Fallback to smart keyword-based generation
+    print("No LLM provider available, using smart fallback...")
+    return _create_fallback_events(user_prompt, today)
+
+
+# LLM generations that outlived their request's deadline; kept referenced
+# so they finish and fill the schedule cache for the next caller
+_detached_generations = set()
+
+
+def detach(task: asyncio.Future) -> None:
+    _detached_generations.add(task)
+    task.add_done_callback(_detached_generations.discard)
+    # retrieve the outcome so an error is not reported as "never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def generate_with_deadline(
+    user_prompt: str,
+    deadline_ms: int,
+    today: datetime = None,
+    user: str = "",
+    priority: int = INTERACTIVE,
+) -> ScheduleResponse:
+    """Return the LLM result if it arrives within ``deadline_ms``, else the fallback.
+
+    The rule-based result is computed up front so it is ready the moment
+    the deadline passes; the clock starts before the semantic cache lookup,
+    which may have to embed the prompt. A late LLM generation that already
+    holds a slot is detached rather than cancelled, so its result still
+    lands in the schedule cache; one still queued is cancelled. A full LLM
+    queue also yields the fallback, since it is within the budget.
+    """
+    today = today or datetime.now()
+
+    cached = _exact_cached(user_prompt, today)
+    if cached is not None:
+        return cached
+
+    fallback = _create_fallback_events(user_prompt, today)
+
+    async def cached_or_generated() -> ScheduleResponse:
+        # the semantic lookup may wait on an embedding, so it runs on the budget too
+        similar = await _semantic_cached(user_prompt, today)
+        if similar is not None:
+            return similar
+        return await generation_flights.do(
+            key, lambda: _generate_and_cache(user_prompt, today, user, priority)
+        )
+
+    def let_go() -> None:
+        # only admitted work runs on into the cache; a generation still
+        # waiting for a slot would hold a queue place nobody is waiting on
+        if key in _admitted_flights:
+            detach(task)
+        else:
+            task.cancel()
+
+    key = _flight_key(user_prompt, today, priority)
+    task = asyncio.ensure_future(cached_or_generated())
+    try:
+        done, _ = await asyncio.wait({task}, timeout=deadline_ms / 1000)
+    except asyncio.CancelledError:
+        let_go()
+        raise
+
+    if task in done:
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            return task.result()
+    else:
+        print(f"LLM missed {deadline_ms} ms deadline, returning smart fallback")
+        let_go()
+    return fallback
+
+
+def _queue_user(payload: ScheduleRequest, request: Request) -> str:
+    return payload.user_id or (request.client.host if request.client else "")
+
+
+def _too_busy(error: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
 @router.post("/generate", response_model=ScheduleResponse)
-def generate_schedule(payload: ScheduleRequest):
+async def generate_schedule(payload: ScheduleRequest, request: Request):
     """
     Generate multiple calendar events from natural language description using Ollama (local LLM).
     Example: "I want to wake up at 6 AM, pray Fajr, then study from 8-10 AM"
+    Identical prompts on the same day are answered from the schedule cache.
+    With "deadline_ms" the response is bounded by that budget; "source"
+    says whether it came from the LLM, the cache or the fallback rules.
+    Responds 429 with Retry-After when the LLM queue is full.
     """
+    user = _queue_user(payload, request)
     try:
-        # Get current date context
-        today = datetime.now()
-        tomorrow = today + timedelta(days=1)
-        
-        # Build the prompt
-        prompt = _build_ai_prompt(payload.prompt, today, tomorrow)
-        
-        # Try Ollama first (local, free, no keys needed)
-        print("Using Ollama (local LLM, no keys needed)...")
-        ollama_response = call_ollama(prompt)
-        if ollama_response:
-            try:
-                events_data = _parse_ai_response(ollama_response, today)
-                if events_data:
-                    return ScheduleResponse(
-                        events=events_data,
-                        summary=f"✅ Generated {len(events_data)} event(s) using Ollama (local, free)"
-                    )
-            except Exception as ollama_error:
-                print(f"Ollama parsing error: {ollama_error}")
-        
-        # Fallback to smart keyword-based generation
-        print("Ollama unavailable, using smart fallback...")
-        return _create_fallback_events(payload.prompt, today)
+        if payload.deadline_ms:
+            return await generate_with_deadline(payload.prompt, payload.deadline_ms, user=user)
+        return await generate_schedule_response(payload.prompt, user=user)
 
+    except QueueFullError as e:
+        raise _too_busy(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -410,3 +547,279 @@ def generate_schedule(payload: ScheduleRequest):
             detail=f"Failed to generate schedule: {str(e)}. Check server logs for details."
         )
 
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def _schedule_events_sse(user_prompt: str, user: str) -> AsyncIterator[str]:
+    """SSE messages: one "event" per EventItem as soon as it is decoded, then "done" """
+    today = datetime.now()
+
+    cached = await _cached_schedule(user_prompt, today)
+    if cached is not None:
+        for event in cached.events:
+            yield _sse("event", event.model_dump_json())
+        yield _sse("done", json.dumps({"summary": cached.summary, "count": len(cached.events), "source": cached.source}))
+        return
+
+    prompt = _build_ai_prompt(user_prompt, today, today + timedelta(days=1))
+    parser = JSONArrayStreamParser()
+    events = []
+    try:
+        stream = stream_ollama(
+            prompt, system=SYSTEM_PROMPT, max_tokens=_num_predict(user_prompt, today)
+        )
+        async with llm_admission.slot(user), aclosing(stream) as fragments:
+            async for fragment in fragments:
+                for event_data in parser.feed(fragment):
+                    event = _to_event_item(event_data, today)
+                    if event is not None:
+                        events.append(event)
+                        yield _sse("event", event.model_dump_json())
+                if parser.finished:
+                    break
+    except Exception as e:
+        print(f"Ollama streaming error: {e}")
+
+    if events:
+        result = ScheduleResponse(
+            events=events,
+            summary=f"✅ Generated {len(events)} event(s) using Ollama (local, free)",
+            source="ollama",
+        )
+        schedule_cache.put(user_prompt, today, result)
+        await semantic_cache.put(user_prompt, today, result)
+        source = "ollama"
+    else:
+        print("Ollama unavailable, using smart fallback...")
+        result = _create_fallback_events(user_prompt, today)
+        for event in result.events:
+            yield _sse("event", event.model_dump_json())
+        source = "fallback"
+    yield _sse("done", json.dumps({"summary": result.summary, "count": len(result.events), "source": source}))
+
+
+@router.post("/generate/stream")
+async def generate_schedule_stream(payload: ScheduleRequest, request: Request):
+    """
+    Streaming variant of /chat/generate using server-sent events.
+    Each EventItem is sent as an "event" message as soon as the model has
+    finished writing it; a final "done" message carries the summary.
+    Responds 429 with Retry-After when the LLM queue is full.
+    """
+    try:
+        llm_admission.check(INTERACTIVE)
+    except QueueFullError as e:
+        raise _too_busy(e)
+    return StreamingResponse(
+        _schedule_events_sse(payload.prompt, _queue_user(payload, request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _generate_batch_item(
+    index: int, item: ScheduleRequest, today: datetime, semaphore: asyncio.Semaphore, user: str
+):
+    """One batch entry; any failure (a full LLM queue included) degrades to
+    the rule-based fallback"""
+    user_prompt = item.prompt
+    user = item.user_id or user
+    async with semaphore:
+        try:
+            if item.deadline_ms:
+                return index, await generate_with_deadline(
+                    user_prompt, item.deadline_ms, today, user=user, priority=BATCH
+                )
+            return index, await generate_schedule_response(
+                user_prompt, today, user=user, priority=BATCH
+            )
+        except Exception as e:
+            print(f"Batch item {index} failed, using smart fallback: {e}")
+            return index, _create_fallback_events(user_prompt, today)
+
+
+async def _batch_ndjson(tasks) -> AsyncIterator[str]:
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            yield json.dumps({"index": index, **result.model_dump()}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/generate/batch", response_model=BatchScheduleResponse)
+async def generate_schedule_batch(payload: BatchScheduleRequest, request: Request):
+    """
+    Generate schedules for several prompts concurrently.
+    At most BATCH_CONCURRENCY generations run at once, queued behind
+    interactive requests. Results come back in request order, or with
+    "stream": true as NDJSON lines
+    ({"index": i, "events": [...], "summary": ...}) in completion order.
+    Responds 429 with Retry-After when the LLM queue has no room for batch work.
+    """
+    if len(payload.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many requests in batch ({len(payload.requests)} > {BATCH_MAX_ITEMS})",
+        )
+
+    try:
+        llm_admission.check(BATCH)
+    except QueueFullError as e:
+        raise _too_busy(e)
+
+    today = datetime.now()
+    user = request.client.host if request.client else ""
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+    tasks = [
+        asyncio.ensure_future(_generate_batch_item(i, item, today, semaphore, user))
+        for i, item in enumerate(payload.requests)
+    ]
+
+    if payload.stream:
+        return StreamingResponse(_batch_ndjson(tasks), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    return BatchScheduleResponse(results=[result for _, result in results])
+
+
+def _event_vevent(event: EventItem) -> Optional[str]:
+    """The generated event as a VEVENT, or None if the model gave it a
+    date or time that does not parse"""
+    try:
+        day = datetime.strptime(event.date.strip(), "%Y-%m-%d")
+        start = datetime.strptime(event.start_time.strip(), "%H:%M")
+        end = datetime.strptime(event.end_time.strip(), "%H:%M")
+    except ValueError:
+        return None
+    start = day.replace(hour=start.hour, minute=start.minute)
+    end = day.replace(hour=end.hour, minute=end.minute)
+    if end < start:
+        end += timedelta(days=1)  # runs past midnight
+    return build_vevent(
+        event.title,
+        start.strftime("%Y%m%dT%H%M%S"),
+        end.strftime("%Y%m%dT%H%M%S"),
+        event.location,
+        event.description,
+    )
+
+
+async def _run_job(job: Job) -> None:
+    """Generate the job's schedule, then optionally add it to the calendar"""
+    while job.result is None:
+        try:
+            if job.deadline_ms:
+                job.result = await generate_with_deadline(
+                    job.prompt, job.deadline_ms, user=job.queue_user
+                )
+            else:
+                job.result = await generate_schedule_response(job.prompt, user=job.queue_user)
+        except QueueFullError as e:
+            # nobody is holding a connection open, so wait for room instead of failing
+            await asyncio.sleep(e.retry_after)
+
+    if job.auto_insert:
+        vevents = [_event_vevent(event) for event in job.result.events]
+        if None in vevents:
+            print(f"Job {job.id}: skipping {vevents.count(None)} event(s) with an invalid date or time")
+            vevents = [vevent for vevent in vevents if vevent is not None]
+        job.event_ids = await asyncio.to_thread(
+            events_service.add_events_to_user, job.user_id, vevents
+        )
+
+
+job_manager = JobManager(_run_job)
+
+
+@router.post("/jobs", response_model=ScheduleJob, status_code=202)
+async def create_schedule_job(payload: ScheduleJobRequest, request: Request, response: Response):
+    """
+    Start generating a schedule in the background and return at once.
+    Poll GET /chat/jobs/{job_id}, or listen on GET /chat/jobs/{job_id}/events
+    (server-sent events) for completion. With "auto_insert": true the
+    events are added to the calendar of "user_id" when the job finishes.
+    Responds 429 with Retry-After when too many jobs are waiting.
+    """
+    if payload.auto_insert:
+        if not payload.user_id:
+            raise HTTPException(status_code=400, detail="auto_insert requires user_id")
+        if not db.get_by_id(payload.user_id):
+            raise HTTPException(status_code=404, detail=f"User not found with ID: {payload.user_id}")
+
+    job = Job(
+        payload.prompt,
+        user_id=payload.user_id,
+        deadline_ms=payload.deadline_ms,
+        auto_insert=payload.auto_insert,
+        queue_user=_queue_user(payload, request),
+    )
+    try:
+        job_manager.submit(job)
+    except QueueFullError as e:
+        raise _too_busy(e)
+    response.headers["Location"] = f"/chat/jobs/{job.id}"
+    return job.to_dict()
+
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=ScheduleJob)
+def get_schedule_job(job_id: str):
+    """Status of a background job, with its result once it is done"""
+    return _get_job(job_id).to_dict()
+
+
+async def _job_events_sse(job: Job) -> AsyncIterator[str]:
+    """A "status" message now, then "done" with the finished job"""
+    yield _sse("status", json.dumps(job.to_dict()))
+    while not job.done.is_set():
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=JOBS_SSE_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"  # comment line; keeps proxies from timing out
+    yield _sse("done", json.dumps(job.to_dict()))
+
+
+@router.get("/jobs/{job_id}/events")
+async def schedule_job_events(job_id: str):
+    """Server-sent events channel that fires when the job finishes"""
+    job = _get_job(job_id)
+    return StreamingResponse(
+        _job_events_sse(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats")
+def schedule_cache_stats():
+    """Hit/miss counters and size of the /chat/generate result cache and
+    of the semantic cache behind it"""
+    return {
+        **schedule_cache.stats(),
+        "semantic": semantic_cache.stats(),
+        "in_flight": generation_flights.in_flight(),
+        "coalesced": generation_flights.coalesced,
+    }
+
+
+@router.get("/queue/stats")
+def llm_queue_stats():
+    """Depth, admissions, rejections and wait times of the LLM admission
+    queue, plus background job counts"""
+    return {**llm_admission.stats(), "jobs": job_manager.stats()}
+
+
+@router.get("/providers")
+def provider_stats():
+    """Per-provider latency, circuit state and hedge counters of the LLM router"""
+    return llm_router.stats()
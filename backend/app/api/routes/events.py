@@ -1,9 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
+from datetime import datetime
+import asyncio
+import base64
+import json
+import time
+from email.utils import formatdate, parsedate_to_datetime
 
+from app.services.events_cache import FeedCache, ListingCache, etag_matches
 from app.services.events_service import EventsService
-from app.database.connection import db
+from app.database.connection import db, EventConflictError, EventNotFoundError
+from app.utils.ical import CalendarSplitter, to_epoch
 
 router = APIRouter(prefix="/events", tags=["events"]) 
 
@@ -14,6 +23,8 @@ class EventCreate(BaseModel):
 
 
 events_service = EventsService(db)
+listing_cache = ListingCache()
+feed_cache = FeedCache()
 
 
 @router.post("/add")
@@ -25,17 +36,18 @@ def add_event(payload: EventCreate):
     # Debug: Check if user exists
     user = db.get_by_id(payload.user_id)
     if not user:
-        # List available user IDs for debugging
-        available_ids = list(db._users.keys())
-        print(f"DEBUG: User {payload.user_id} not found. Available users: {available_ids}")
+        user_count = db.count_users()
+        print(f"DEBUG: User {payload.user_id} not found. Known users: {user_count}")
         raise HTTPException(
             status_code=404, 
-            detail=f"User not found with ID: {payload.user_id}. The server may have restarted. Please log in again. Available users: {len(available_ids)}"
+            detail=f"User not found with ID: {payload.user_id}. The server may have restarted. Please log in again. Available users: {user_count}"
         )
     
     try:
-        # store the raw VEVENT string as the event payload; services/db may extend later
-        events_service.add_event_to_user(payload.user_id, {"vevent": payload.vevent})
+        # parsed once here; the raw VEVENT text is kept on the record for round-trip
+        event_id = events_service.add_event_to_user(payload.user_id, payload.vevent)
+    except EventConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         # Provide more helpful error message
         raise HTTPException(
@@ -43,17 +55,264 @@ def add_event(payload: EventCreate):
             detail=f"User not found with ID: {payload.user_id}. Make sure you're logged in and the user exists."
         )
 
-    return {"status": "ok", "message": "Event added successfully"}
+    return {"status": "ok", "message": "Event added successfully", "event_id": event_id}
+
+
+# VEVENTs handed to the store per call while importing a calendar
+IMPORT_BATCH_SIZE = 500
+
+
+@router.post("/{user_id}/import")
+async def import_calendar(user_id: str, request: Request):
+    """Import every VEVENT of an uploaded .ics file (text/calendar body).
+
+    The upload is split as it arrives, so files of any size can be sent,
+    chunked or not, and events are stored in batches of IMPORT_BATCH_SIZE.
+    The summary lists each VEVENT in file order with its new "id", or with
+    an "error" if it was skipped (e.g. its UID is already in the calendar).
+    """
+    if db.get_by_id(user_id) is None:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+
+    started = time.perf_counter()
+    splitter = CalendarSplitter()
+    results = []
+    pending = []  # (index, vevent text) not stored yet
+    imported = 0
+
+    async def flush() -> None:
+        nonlocal imported
+        texts = [text for _, text in pending]
+        try:
+            outcomes = await asyncio.to_thread(events_service.import_events, user_id, texts)
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+        for (index, _), (event_id, error) in zip(pending, outcomes):
+            if error is None:
+                imported += 1
+                results.append({"index": index, "id": event_id})
+            else:
+                results.append({"index": index, "error": error})
+        pending.clear()
+
+    async def collect(items) -> None:
+        for text, error in items:
+            index = len(results) + len(pending)
+            if error is not None:
+                results.append({"index": index, "error": error})
+            else:
+                pending.append((index, text))
+                if len(pending) >= IMPORT_BATCH_SIZE:
+                    await flush()
+
+    async for chunk in request.stream():
+        await collect(splitter.feed(chunk))
+    await collect(splitter.close())
+    if pending:
+        await flush()
+
+    results.sort(key=lambda r: r["index"])  # skipped events were listed before their batch
+    seconds = time.perf_counter() - started
+    return {
+        "status": "ok",
+        "imported": imported,
+        "failed": len(results) - imported,
+        "seconds": round(seconds, 3),
+        "events_per_second": round(len(results) / seconds) if seconds else None,
+        "events": results,
+    }
+
+
+# Events fetched per store call while streaming NDJSON
+STREAM_PAGE_SIZE = 500
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(f"seq:{seq}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, _, seq = raw.partition(":")
+        if prefix != "seq":
+            raise ValueError(cursor)
+        return int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _stream_events(user_id: str, after_seq: int, limit: Optional[int]):
+    """Yield NDJSON lines page by page so only one page is held at a time"""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = STREAM_PAGE_SIZE if remaining is None else min(STREAM_PAGE_SIZE, remaining)
+        try:
+            page = db.get_events_page(user_id, after_seq, size)
+        except ValueError:
+            return  # user vanished mid-stream
+        for event in page:
+            yield json.dumps(event.to_dict()) + "\n"
+        if len(page) < size:
+            return
+        after_seq = page[-1].seq
+        if remaining is not None:
+            remaining -= len(page)
 
 
 @router.get("/{user_id}", response_model=List[Dict])
-def get_user_events(user_id: str):
-    """Get all events for a user by user_id."""
+def get_user_events(
+    user_id: str,
+    request: Request,
+    start: Optional[datetime] = Query(None, description="Only events ending after this time"),
+    end: Optional[datetime] = Query(None, description="Only events starting before this time"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+):
+    """Get all events for a user by user_id.
+
+    Each item carries its stable "id", the original "vevent" text and the
+    fields parsed at write time (uid, start, end, summary, location,
+    description).
+
+    With ``start`` and/or ``end`` only events overlapping that window are
+    returned, ordered by start time; events without a DTSTART are left out.
+    Times without an offset are read as UTC, like floating VEVENT times.
+
+    The full listing can be paged with ``limit``/``cursor``: when more events
+    remain, the ``X-Next-Cursor`` response header holds the cursor for the
+    next page. Sending ``Accept: application/x-ndjson`` streams the listing
+    as one JSON object per line instead of building one large array.
+
+    The plain full listing is cached per user and carries a strong ETag;
+    a matching ``If-None-Match`` gets ``304 Not Modified``. Its
+    ``X-Calendar-Version`` header is the baseline for ``/changes?since=``.
+    """
+    ranged = start is not None or end is not None
+    if ranged and (limit is not None or cursor is not None):
+        raise HTTPException(status_code=400, detail="limit/cursor cannot be combined with start/end")
+    after_seq = _decode_cursor(cursor) if cursor else 0
+    headers = {}
+
+    try:
+        if NDJSON_MEDIA_TYPE in request.headers.get("accept", "") and not ranged:
+            db.get_events_page(user_id, 0, 0)  # 404 before the stream starts
+            return StreamingResponse(
+                _stream_events(user_id, after_seq, limit), media_type=NDJSON_MEDIA_TYPE
+            )
+        if ranged:
+            range_start = to_epoch(start) if start else -(2 ** 62)
+            range_end = to_epoch(end) if end else 2 ** 62
+            if range_start >= range_end:
+                raise HTTPException(status_code=400, detail="start must be before end")
+            events = db.get_events_in_range(user_id, range_start, range_end)
+        elif limit is not None or cursor:
+            page_size = limit or 1000
+            events = db.get_events_page(user_id, after_seq, page_size + 1)
+            if len(events) > page_size:
+                events = events[:page_size]
+                headers["X-Next-Cursor"] = _encode_cursor(events[-1].seq)
+        else:
+            return _cached_listing(user_id, request.headers.get("if-none-match"))
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+
+    return Response(_encode_events(events), media_type="application/json", headers=headers)
+
+
+def _encode_events(events) -> bytes:
+    # Records are already plain data, so skip response_model re-validation
+    return json.dumps([event.to_dict() for event in events], separators=(",", ":")).encode()
+
+
+def _cached_listing(user_id: str, if_none_match: Optional[str]) -> Response:
+    """Full listing served from the per-user cache, with ETag/304 support"""
+    version = db.get_version(user_id)
+    cached = listing_cache.get(user_id, version)
+    if cached is None:
+        version, events = db.get_events_versioned(user_id)
+        body = _encode_events(events)
+        etag = listing_cache.put(user_id, version, body)
+    else:
+        etag, body = cached
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "X-Calendar-Version": str(version),
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _not_modified_since(if_modified_since: Optional[str], last_modified: float) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+@router.get("/{user_id}/calendar.ics")
+def get_calendar_feed(user_id: str, request: Request):
+    """The user's calendar as an iCalendar feed for subscribing from
+    desktop calendar apps.
+
+    The feed is cached and, when events change, rebuilt from per-event
+    chunks, re-rendering only the events that changed. It carries an ETag
+    and Last-Modified; a poll with a matching If-None-Match (or, without
+    one, an If-Modified-Since not before Last-Modified) gets
+    ``304 Not Modified``.
+    """
     user = db.get_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
-    
-    return user.events
+    try:
+        etag, last_modified, body = feed_cache.get(db, user_id, user.name)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None
+        and _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        body,
+        media_type="text/calendar; charset=utf-8",
+        headers={**headers, "Content-Disposition": 'inline; filename="calendar.ics"'},
+    )
+
+
+@router.get("/{user_id}/changes")
+def get_event_changes(user_id: str, since: int = Query(..., ge=0)):
+    """Changes to a user's events after version ``since``.
+
+    Returns the current version and the add/update/delete operations in
+    order. When ``since`` has fallen out of the bounded change log,
+    ``resync`` is true and the client should refetch GET /events/{user_id}.
+    """
+    try:
+        version, changes = db.get_changes(user_id, since)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+
+    if changes is None:
+        return {"version": version, "resync": True, "changes": []}
+    return {
+        "version": version,
+        "resync": False,
+        "changes": [change.to_dict() for change in changes],
+    }
 
 
 class EventUpdate(BaseModel):
@@ -73,7 +332,7 @@ def update_event(payload: EventUpdate):
         events_service.update_event_for_user(
             payload.user_id, 
             payload.event_index, 
-            {"vevent": payload.vevent}
+            payload.vevent
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -81,17 +340,57 @@ def update_event(payload: EventUpdate):
     return {"status": "ok", "message": "Event updated successfully"}
 
 
-@router.delete("/{user_id}/{event_index}")
-def delete_event(user_id: str, event_index: int):
-    """Delete an event at the given index for a user."""
+class EventReplace(BaseModel):
+    vevent: str
+
+
+# ids are iCalendar UIDs, which may contain "/"
+@router.put("/{user_id}/{event_id:path}")
+def update_event_by_id(user_id: str, event_id: str, payload: EventReplace):
+    """Replace the event with the given stable id; its id and position are kept."""
     user = db.get_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
-    
+
     try:
-        events_service.delete_event_for_user(user_id, event_index)
+        events_service.update_event_by_id(user_id, event_id, payload.vevent)
+    except EventNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    
+
+    return {"status": "ok", "message": "Event updated successfully", "event_id": event_id}
+
+
+@router.delete("/{user_id}")
+def delete_event_at(user_id: str, index: int = Query(...)):
+    """Delete the event at list position ``index`` (compatibility only).
+
+    Positions shift when other events are deleted, so a retried request
+    can remove a different event; new clients delete by id instead.
+    """
+    user = db.get_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+
+    try:
+        events_service.delete_event_for_user(user_id, index)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     return {"status": "ok", "message": "Event deleted successfully"}
 
+
+@router.delete("/{user_id}/{event_id:path}")
+def delete_event(user_id: str, event_id: str):
+    """Delete an event by its stable id; 404 if there is no such event"""
+    user = db.get_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail=f"User not found with ID: {user_id}")
+    
+    try:
+        events_service.delete_event_by_id(user_id, event_id)
+    except EventNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {"status": "ok", "message": "Event deleted successfully"}
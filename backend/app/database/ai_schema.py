@@ -1,7 +1,12 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 class AIRequest(BaseModel):
     user_text: str
+    # Latency budget; when set, a rule-based event is returned if the model
+    # has not answered in time
+    deadline_ms: Optional[int] = Field(default=None, ge=1)
 
 class AIResponse(BaseModel):
     title: str
@@ -9,3 +14,4 @@ class AIResponse(BaseModel):
     start_time: str
     end_time: str
     description: str | None = None
+    source: str = ""  # "openai" or "fallback"
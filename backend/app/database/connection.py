@@ -1,58 +1,299 @@
-from typing import Dict, Optional, List
+import threading
+from collections import deque
+from itertools import count, islice
+from typing import Deque, Dict, Iterable, NamedTuple, Optional, List, Tuple
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.database.event_index import EventIndex, SeqIndex
+from app.utils.ical import EventRecord
 
 
 class StoredUser(BaseModel):
+  model_config = ConfigDict(arbitrary_types_allowed=True)
+
   id: str
   name: str
   email: str
   password: str  # NOTE: plaintext for demo; replace with hashing in production
-  events: List[Dict] = Field(default_factory=list)
+  # Keyed by stable event id; dict order is insertion order, which is what
+  # the legacy index-based routes address.
+  events: Dict[str, EventRecord] = Field(default_factory=dict)
+
+
+class Change(NamedTuple):
+  """One entry of a user's change log; event is None for deletes"""
+  version: int
+  op: str  # "add" | "update" | "delete"
+  event_id: str
+  event: Optional[EventRecord]
+
+  def to_dict(self) -> Dict:
+    return {
+      "version": self.version,
+      "op": self.op,
+      "id": self.event_id,
+      "event": self.event.to_dict() if self.event is not None else None,
+    }
+
+
+class EventNotFoundError(ValueError):
+  pass
+
+
+class EventConflictError(ValueError):
+  pass
+
+
+def normalize_email(email: str) -> str:
+  """Canonical form used as the key of the email index"""
+  return email.strip().lower()
 
 
 class InMemoryDB:
-  def __init__(self) -> None:
+  # Number of locks user mutations are striped over. Users hashing to
+  # different stripes never contend with each other.
+  LOCK_STRIPES = 64
+  # Changes kept per user for delta sync; older clients must resync fully
+  CHANGE_LOG_SIZE = 1000
+
+  def __init__(self, lock_stripes: int = LOCK_STRIPES) -> None:
     self._users: Dict[str, StoredUser] = {}
+    self._email_index: Dict[str, str] = {}  # normalized email -> user id
+    self._event_indexes: Dict[str, EventIndex] = {}  # user id -> start-time index
+    self._seq_counters: Dict[str, count] = {}  # user id -> next insertion seq
+    self._seq_indexes: Dict[str, SeqIndex] = {}  # user id -> events by seq, for paging
+    self._versions: Dict[str, int] = {}  # user id -> bumped on every event mutation
+    self._change_logs: Dict[str, Deque[Change]] = {}  # user id -> last CHANGE_LOG_SIZE changes
+    self._users_lock = threading.Lock()  # guards _users/_email_index writes
+    self._stripes = [threading.Lock() for _ in range(max(1, lock_stripes))]
+
+  def _lock_for(self, user_id: str) -> threading.Lock:
+    """Return the stripe lock that serializes mutations of one user"""
+    return self._stripes[hash(user_id) % len(self._stripes)]
+
+  def count_users(self) -> int:
+    return len(self._users)
 
   def get_by_email(self, email: str) -> Optional[StoredUser]:
-    return next((u for u in self._users.values() if u.email == email), None)
+    user_id = self._email_index.get(normalize_email(email))
+    if user_id is None:
+      return None
+    return self._users.get(user_id)
 
   def get_by_id(self, user_id: str) -> Optional[StoredUser]:
     """Get user by ID"""
     return self._users.get(user_id)
 
   def create_user(self, user: StoredUser) -> StoredUser:
-    self._users[user.id] = user
+    """Insert a user, enforcing a unique (case-insensitive) email"""
+    key = normalize_email(user.email)
+    with self._users_lock:
+      if key in self._email_index:
+        raise ValueError(f"Email already registered: {user.email}")
+      index = EventIndex()
+      for event in user.events.values():
+        index.add(event)
+      counter = count(1)
+      for event in user.events.values():
+        event.seq = next(counter)
+      self._seq_counters[user.id] = counter
+      self._seq_indexes[user.id] = SeqIndex(list(user.events.values()))
+      self._versions[user.id] = 0
+      self._change_logs[user.id] = deque(maxlen=self.CHANGE_LOG_SIZE)
+      self._event_indexes[user.id] = index
+      self._users[user.id] = user
+      self._email_index[key] = user.id
+      self._user_created(user)
     return user
 
-  def add_event(self, user_id: str, event: Dict) -> None:
-    user = self._users.get(user_id)
+  def _user_created(self, user: StoredUser) -> None:
+    """Hook run under _users_lock once a user is stored"""
 
+  def _get_user(self, user_id: str) -> StoredUser:
+    user = self._users.get(user_id)
     if not user:
       raise ValueError(f"User not found with ID: {user_id}")
+    return user
 
-    user.events.append(event)
+  def _insert(self, user: StoredUser, event: EventRecord) -> None:
+    """Store one event; caller holds the user's stripe lock"""
+    if event.id in user.events:
+      raise EventConflictError(f"Event {event.id} already exists")
+    event.seq = next(self._seq_counters[user.id])
+    user.events[event.id] = event
+    self._event_indexes[user.id].add(event)
+    self._seq_indexes[user.id].add(event)
+    self._record_change(user.id, "add", event.id, event)
 
-  def update_event(self, user_id: str, event_index: int, event: Dict) -> None:
-    """Update an event at the given index for a user"""
-    user = self._users.get(user_id)
-    if not user:
-      raise ValueError(f"User not found with ID: {user_id}")
+  def _replace(self, user: StoredUser, event_id: str, event: EventRecord) -> None:
+    """Swap the record behind event_id, keeping its id and position"""
+    index = self._event_indexes[user.id]
+    old = user.events[event_id]
+    index.remove(old)
+    event.id = event_id
+    event.seq = old.seq
+    user.events[event_id] = event
+    index.add(event)
+    self._seq_indexes[user.id].replace(event)
+    self._record_change(user.id, "update", event_id, event)
+
+  def _remove(self, user: StoredUser, event_id: str) -> None:
+    old = user.events.pop(event_id)
+    self._event_indexes[user.id].remove(old)
+    self._seq_indexes[user.id].remove(old)
+    self._record_change(user.id, "delete", event_id, None)
+
+  def _record_change(
+    self, user_id: str, op: str, event_id: str, event: Optional[EventRecord]
+  ) -> None:
+    """Bump the user's version and append the change to their bounded log"""
+    version = self._versions[user_id] + 1
+    self._versions[user_id] = version
+    self._change_logs[user_id].append(Change(version, op, event_id, event))
+
+  def _id_at(self, user: StoredUser, event_index: int) -> str:
+    """Resolve a list position to an event id (O(n); compatibility only)"""
     if event_index < 0 or event_index >= len(user.events):
       raise ValueError(f"Event index {event_index} out of range")
-    user.events[event_index] = event
+    return next(islice(user.events, event_index, None))
+
+  def add_event(self, user_id: str, event: EventRecord) -> None:
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      self._insert(user, event)
+
+  def add_events(self, user_id: str, events: Iterable[EventRecord]) -> None:
+    """Append several events under a single lock acquisition"""
+    user = self._get_user(user_id)
+    events = list(events)
+    with self._lock_for(user_id):
+      for event in events:
+        self._insert(user, event)
+
+  def try_add_events(self, user_id: str, events: Iterable[EventRecord]) -> List[Optional[str]]:
+    """Append the events that do not conflict, under a single lock acquisition.
+
+    Returns one entry per event: None if it was stored, else the reason it
+    was not.
+    """
+    user = self._get_user(user_id)
+    events = list(events)
+    results: List[Optional[str]] = []
+    with self._lock_for(user_id):
+      for event in events:
+        try:
+          self._insert(user, event)
+          results.append(None)
+        except EventConflictError as e:
+          results.append(str(e))
+    return results
+
+  def update_event(self, user_id: str, event_index: int, event: EventRecord) -> None:
+    """Update an event at the given index for a user"""
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      self._replace(user, self._id_at(user, event_index), event)
 
   def delete_event(self, user_id: str, event_index: int) -> None:
     """Delete an event at the given index for a user"""
-    user = self._users.get(user_id)
-    if not user:
-      raise ValueError(f"User not found with ID: {user_id}")
-    if event_index < 0 or event_index >= len(user.events):
-      raise ValueError(f"Event index {event_index} out of range")
-    user.events.pop(event_index)
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      self._remove(user, self._id_at(user, event_index))
+
+  def update_event_by_id(self, user_id: str, event_id: str, event: EventRecord) -> None:
+    """Replace the event with the given stable id"""
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      if event_id not in user.events:
+        raise EventNotFoundError(f"Event {event_id} not found")
+      self._replace(user, event_id, event)
+
+  def delete_event_by_id(self, user_id: str, event_id: str) -> None:
+    """Delete the event with the given stable id"""
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      if event_id not in user.events:
+        raise EventNotFoundError(f"Event {event_id} not found")
+      self._remove(user, event_id)
+
+  def get_events(self, user_id: str) -> List[EventRecord]:
+    """Snapshot of a user's events in insertion order"""
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      return list(user.events.values())
+
+  def get_version(self, user_id: str) -> int:
+    """Counter bumped on every change to the user's events"""
+    self._get_user(user_id)
+    return self._versions[user_id]
+
+  def get_events_versioned(self, user_id: str) -> Tuple[int, List[EventRecord]]:
+    """Events snapshot together with the version it corresponds to"""
+    user = self._get_user(user_id)
+    with self._lock_for(user_id):
+      return self._versions[user_id], list(user.events.values())
+
+  def get_changes(self, user_id: str, since: int) -> Tuple[int, Optional[List[Change]]]:
+    """Changes after version ``since`` and the current version.
+
+    The change list is None when ``since`` is no longer covered by the log
+    (or is ahead of the store), meaning the client has to refetch everything.
+    """
+    self._get_user(user_id)
+    with self._lock_for(user_id):
+      version = self._versions[user_id]
+      log = self._change_logs[user_id]
+      if since > version:
+        return version, None
+      if since == version:
+        return version, []
+      if not log or log[0].version > since + 1:
+        return version, None
+      # versions in the log are contiguous, so offset straight to since + 1
+      return version, list(islice(log, since + 1 - log[0].version, None))
+
+  def get_events_page(self, user_id: str, after_seq: int, limit: int) -> List[EventRecord]:
+    """Up to ``limit`` events inserted after ``after_seq``, in insertion order"""
+    self._get_user(user_id)
+    with self._lock_for(user_id):
+      return self._seq_indexes[user_id].after(after_seq, limit)
+
+  def get_events_in_range(self, user_id: str, start: int, end: int) -> List[EventRecord]:
+    """Events overlapping [start, end) (epoch seconds), ordered by start"""
+    self._get_user(user_id)
+    with self._lock_for(user_id):
+      return self._event_indexes[user_id].overlapping(start, end)
+
+  def close(self) -> None:
+    """Nothing to release; the data goes with the process"""
+
+
+def create_db():
+  """Build the storage backend selected by DB_BACKEND"""
+  from app.utils import config
+
+  if config.DB_BACKEND == "sql":
+    from app.database.sql_store import SQLDB
+    return SQLDB(config.DATABASE_URL)
+  if config.DB_DATA_DIR:
+    from app.database.durable_store import DurableDB
+    return DurableDB(config.DB_DATA_DIR)
+  return InMemoryDB()
+
+
+_db_lock = threading.Lock()
 
 
+def __getattr__(name: str):
+  # The singleton store (in-memory, kept in DB_DATA_DIR, unless
+  # DB_BACKEND=sql) is built on the first "from ... import db", not when the
+  # module is imported, so importing InMemoryDB or StoredUser (benchmarks,
+  # scripts) does not replay and lock the server's data directory.
+  if name == "db":
+    with _db_lock:
+      if "db" not in globals():
+        globals()["db"] = create_db()
+    return globals()["db"]
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Singleton in-memory store for this demo
-db = InMemoryDB()
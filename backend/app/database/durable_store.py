@@ -0,0 +1,557 @@
+"""
+InMemoryDB that survives restarts.
+
+Every mutation is appended to a write-ahead log before the call returns;
+reads never touch the disk. Writers from many threads share fsyncs: the
+first one to find no flush in progress writes and fsyncs everything
+buffered so far, and the others wait for that flush instead of issuing
+their own (group commit). Records are buffered under the user's stripe
+lock, so the log holds each user's operations in the order they were
+applied, and fsynced after the lock is released.
+
+Once the log has grown past ``snapshot_bytes`` a snapshot of the whole
+store is written in the background and the log segments it covers are
+deleted. Startup maps the snapshot with mmap, loads it and replays only
+the log segments written after it.
+
+On disk, in ``directory``:
+  snapshot.bin        magic line, 8-byte header length, JSON header with
+                      the users and the offset of each user's events, then
+                      per user one JSON array of columns (ids, seqs, ...)
+  wal-00000001.log    frames of (4-byte length, 4-byte crc32, JSON record)
+  lock                held with flock while a process has the store open,
+                      so a second worker cannot interleave its log writes
+"""
+
+import gc
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from collections import deque
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.database.connection import EventConflictError, InMemoryDB, StoredUser, normalize_email
+from app.database.event_index import EventIndex, SeqIndex
+from app.utils import config
+from app.utils.ical import EventRecord
+
+try:
+  import fcntl
+  FCNTL_AVAILABLE = True
+except ImportError:  # Windows
+  FCNTL_AVAILABLE = False
+
+SNAPSHOT_MAGIC = b"AICAL-SNAPSHOT 1\n"
+SNAPSHOT_NAME = "snapshot.bin"
+_SEGMENT_RE = re.compile(r"wal-(\d{8})\.log$")
+_FRAME = struct.Struct(">II")  # payload length, crc32
+_HEADER_LEN = struct.Struct(">Q")
+
+
+def _segment_name(number: int) -> str:
+  return f"wal-{number:08d}.log"
+
+
+def _fsync_dir(directory: str) -> None:
+  """Make a rename or delete in ``directory`` durable (no-op where unsupported)"""
+  try:
+    fd = os.open(directory, os.O_RDONLY)
+  except OSError:
+    return
+  try:
+    os.fsync(fd)
+  except OSError:
+    pass
+  finally:
+    os.close(fd)
+
+
+_COLUMNS = ("id", "seq", "uid", "start", "end", "summary", "location", "description", "raw")
+
+
+def _event_columns(events: List[EventRecord]) -> List[list]:
+  """Events as one list per attribute; decodes about twice as fast as rows"""
+  return [[getattr(e, name) for e in events] for name in _COLUMNS]
+
+
+def _column_events(columns: List[list]) -> List[EventRecord]:
+  events = []
+  for event_id, seq, uid, start, end, summary, location, description, raw in zip(*columns):
+    event = EventRecord(uid, start, end, summary, location, description, raw, event_id)
+    event.seq = seq
+    events.append(event)
+  return events
+
+
+class WALClosedError(RuntimeError):
+  pass
+
+
+class WriteAheadLog:
+  """Append-only, segmented log with group-commit fsync.
+
+  append() only buffers a record and returns its log sequence number;
+  sync(lsn) returns once that record is on disk. With ``fsync`` off,
+  records are written to the OS but not forced to the device, which
+  survives a process crash but not a power loss.
+  """
+
+  def __init__(self, directory: str, segment: int, fsync: bool = config.DB_WAL_FSYNC) -> None:
+    self.directory = directory
+    self.fsync = fsync
+    self.segment = segment
+    self._file = open(os.path.join(directory, _segment_name(segment)), "ab")
+    self._cond = threading.Condition(threading.Lock())
+    self._buffer: List[bytes] = []
+    self._appended = 0  # lsn of the last buffered record
+    self._durable = 0  # lsn of the last record on disk
+    self._flushing = False
+    self._error: Optional[BaseException] = None
+    self.bytes_since_rotate = 0
+    self.records = 0
+    self.flushes = 0
+
+  def append(self, record: Dict) -> int:
+    payload = json.dumps(record, separators=(",", ":")).encode()
+    frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+    with self._cond:
+      if self._file is None:
+        raise WALClosedError("write-ahead log is closed")
+      self._buffer.append(frame)
+      self._appended += 1
+      self.bytes_since_rotate += len(frame)
+      self.records += 1
+      return self._appended
+
+  def _write(self, file, frames: List[bytes]) -> None:
+    file.write(b"".join(frames))
+    file.flush()
+    if self.fsync:
+      os.fsync(file.fileno())
+
+  def sync(self, lsn: int) -> None:
+    """Block until record ``lsn`` is durable, flushing for others on the way"""
+    with self._cond:
+      while self._durable < lsn:
+        if self._error is not None:
+          raise self._error
+        if self._flushing:
+          self._cond.wait()
+          continue
+        # become the leader: flush everything buffered so far in one write
+        frames, self._buffer = self._buffer, []
+        upto = self._appended
+        file = self._file
+        self._flushing = True
+        self._cond.release()
+        try:
+          self._write(file, frames)
+        except BaseException as e:
+          self._cond.acquire()
+          self._error = e
+          self._flushing = False
+          self._cond.notify_all()
+          raise
+        self._cond.acquire()
+        self._flushing = False
+        self._durable = upto
+        self.flushes += 1
+        self._cond.notify_all()
+
+  def rotate(self) -> int:
+    """Flush, then continue in a new segment; returns the new segment number.
+
+    The caller must keep appends out while this runs (DurableDB holds all
+    of its locks), so the old segment ends exactly at the rotation point.
+    """
+    with self._cond:
+      while self._flushing:
+        self._cond.wait()
+      self._write(self._file, self._buffer)
+      self._buffer = []
+      self._durable = self._appended
+      self._file.close()
+      self.segment += 1
+      self._file = open(os.path.join(self.directory, _segment_name(self.segment)), "ab")
+      _fsync_dir(self.directory)
+      self.bytes_since_rotate = 0
+      self._cond.notify_all()
+      return self.segment
+
+  def close(self) -> None:
+    with self._cond:
+      while self._flushing:
+        self._cond.wait()
+      if self._file is None:
+        return
+      self._write(self._file, self._buffer)
+      self._buffer = []
+      self._durable = self._appended
+      self._file.close()
+      self._file = None
+      self._cond.notify_all()
+
+
+def read_segment(path: str) -> Tuple[List[Dict], int]:
+  """Records of one log segment and the length of its valid prefix.
+
+  Reading stops at the first short or corrupt frame: the tail of a write
+  that was cut off by a crash.
+  """
+  records = []
+  with open(path, "rb") as f:
+    data = f.read()
+  pos = 0
+  while pos + _FRAME.size <= len(data):
+    length, crc = _FRAME.unpack_from(data, pos)
+    payload = data[pos + _FRAME.size:pos + _FRAME.size + length]
+    if len(payload) < length or zlib.crc32(payload) != crc:
+      break
+    records.append(json.loads(payload))
+    pos += _FRAME.size + length
+  return records, pos
+
+
+def _lock_directory(directory: str):
+  """Open and exclusively lock ``directory``/lock; RuntimeError if another
+  process (e.g. a second uvicorn worker) already holds it"""
+  lock_file = open(os.path.join(directory, "lock"), "a+")
+  if not FCNTL_AVAILABLE:
+    print(f"Warning: cannot lock {directory}; make sure only one process uses it")
+    return lock_file
+  try:
+    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+  except OSError:
+    lock_file.close()
+    raise RuntimeError(
+      f"{directory} is in use by another process; run a single worker "
+      "or give each one its own DB_DATA_DIR"
+    )
+  return lock_file
+
+
+class DurableDB(InMemoryDB):
+  """InMemoryDB whose state is kept in ``directory`` across restarts"""
+
+  def __init__(
+    self,
+    directory: str = config.DB_DATA_DIR,
+    fsync: bool = config.DB_WAL_FSYNC,
+    snapshot_bytes: int = config.DB_SNAPSHOT_WAL_BYTES,
+    lock_stripes: int = InMemoryDB.LOCK_STRIPES,
+  ) -> None:
+    super().__init__(lock_stripes)
+    self.directory = directory
+    self.snapshot_bytes = snapshot_bytes
+    self._wal: Optional[WriteAheadLog] = None  # None while recovering
+    self._pending = threading.local()  # lsn this thread has to sync
+    self._snapshot_lock = threading.Lock()
+    self._snapshot_thread: Optional[threading.Thread] = None
+    self.recovered_events = 0
+    self.replayed_records = 0
+    os.makedirs(directory, exist_ok=True)
+    self._lock_file = _lock_directory(directory)
+    # loading allocates millions of long-lived objects; collecting while
+    # that happens only rescans them over and over
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+      last_segment = self._recover()
+    except BaseException:
+      self._lock_file.close()
+      raise
+    finally:
+      if gc_was_enabled:
+        gc.enable()
+    self._wal = WriteAheadLog(directory, last_segment + 1, fsync)
+
+  # --- logging ---------------------------------------------------------
+
+  def _log(self, record: Dict) -> None:
+    """Buffer a record; caller holds the lock that orders it"""
+    if self._wal is not None:
+      self._pending.lsn = self._wal.append(record)
+
+  def _commit(self) -> None:
+    """Wait until this thread's records are durable; maybe start a snapshot"""
+    lsn = getattr(self._pending, "lsn", 0)
+    if lsn and self._wal is not None:
+      self._pending.lsn = 0
+      self._wal.sync(lsn)
+      if self._wal.bytes_since_rotate >= self.snapshot_bytes:
+        self._snapshot_in_background()
+
+  def create_user(self, user: StoredUser) -> StoredUser:
+    super().create_user(user)
+    self._commit()
+    return user
+
+  def _user_created(self, user: StoredUser) -> None:
+    self._log({
+      "op": "user",
+      "id": user.id,
+      "name": user.name,
+      "email": user.email,
+      "password": user.password,
+      "events": [e.to_dict() for e in user.events.values()],
+    })
+
+  def _insert(self, user: StoredUser, event: EventRecord) -> None:
+    super()._insert(user, event)
+    self._log({"op": "add", "user": user.id, "events": [event.to_dict()]})
+
+  def _replace(self, user: StoredUser, event_id: str, event: EventRecord) -> None:
+    super()._replace(user, event_id, event)
+    self._log({"op": "update", "user": user.id, "event": event.to_dict()})
+
+  def _remove(self, user: StoredUser, event_id: str) -> None:
+    super()._remove(user, event_id)
+    self._log({"op": "delete", "user": user.id, "id": event_id})
+
+  def add_event(self, user_id: str, event: EventRecord) -> None:
+    try:
+      super().add_event(user_id, event)
+    finally:
+      self._commit()
+
+  def add_events(self, user_id: str, events: Iterable[EventRecord]) -> None:
+    """Like InMemoryDB.add_events, logged as a single record"""
+    user = self._get_user(user_id)
+    events = list(events)
+    inserted = []
+    try:
+      with self._lock_for(user_id):
+        try:
+          for event in events:
+            InMemoryDB._insert(self, user, event)
+            inserted.append(event.to_dict())
+        finally:
+          # a conflict part-way through still keeps the earlier events
+          if inserted:
+            self._log({"op": "add", "user": user_id, "events": inserted})
+    finally:
+      self._commit()
+
+  def try_add_events(self, user_id: str, events: Iterable[EventRecord]) -> List[Optional[str]]:
+    """Like InMemoryDB.try_add_events, logged as a single record"""
+    user = self._get_user(user_id)
+    events = list(events)
+    results: List[Optional[str]] = []
+    inserted = []
+    try:
+      with self._lock_for(user_id):
+        for event in events:
+          try:
+            InMemoryDB._insert(self, user, event)
+          except EventConflictError as e:
+            results.append(str(e))
+            continue
+          results.append(None)
+          inserted.append(event.to_dict())
+        if inserted:
+          self._log({"op": "add", "user": user_id, "events": inserted})
+    finally:
+      self._commit()
+    return results
+
+  def update_event(self, user_id: str, event_index: int, event: EventRecord) -> None:
+    super().update_event(user_id, event_index, event)
+    self._commit()
+
+  def delete_event(self, user_id: str, event_index: int) -> None:
+    super().delete_event(user_id, event_index)
+    self._commit()
+
+  def update_event_by_id(self, user_id: str, event_id: str, event: EventRecord) -> None:
+    super().update_event_by_id(user_id, event_id, event)
+    self._commit()
+
+  def delete_event_by_id(self, user_id: str, event_id: str) -> None:
+    super().delete_event_by_id(user_id, event_id)
+    self._commit()
+
+  # --- recovery --------------------------------------------------------
+
+  def _segments(self) -> List[Tuple[int, str]]:
+    found = []
+    for name in os.listdir(self.directory):
+      match = _SEGMENT_RE.match(name)
+      if match:
+        found.append((int(match.group(1)), os.path.join(self.directory, name)))
+    return sorted(found)
+
+  def _recover(self) -> int:
+    """Load the snapshot and replay the log after it; returns the last segment number"""
+    first = self._load_snapshot()
+    last = first - 1
+    for number, path in self._segments():
+      if number < first:
+        os.remove(path)  # already in the snapshot; left over from a crash
+        continue
+      records, valid = read_segment(path)
+      if not records:
+        os.remove(path)  # nothing written before the last shutdown
+        continue
+      if valid < os.path.getsize(path):
+        print(f"WAL {path}: dropping torn tail after {len(records)} records")
+        with open(path, "r+b") as f:
+          f.truncate(valid)
+      for record in records:
+        self._apply(record)
+      self.replayed_records += len(records)
+      last = number
+    return last
+
+  def _apply(self, record: Dict) -> None:
+    op = record["op"]
+    if op == "user":
+      events = {}
+      for data in record["events"]:
+        event = EventRecord.from_dict(data)
+        events[event.id] = event
+      super().create_user(StoredUser(
+        id=record["id"],
+        name=record["name"],
+        email=record["email"],
+        password=record["password"],
+        events=events,
+      ))
+    elif op == "add":
+      super().add_events(record["user"], map(EventRecord.from_dict, record["events"]))
+    elif op == "update":
+      event = EventRecord.from_dict(record["event"])
+      super().update_event_by_id(record["user"], event.id, event)
+    elif op == "delete":
+      super().delete_event_by_id(record["user"], record["id"])
+
+  def _load_snapshot(self) -> int:
+    """Load snapshot.bin if there is one; returns the first segment it does not cover"""
+    path = os.path.join(self.directory, SNAPSHOT_NAME)
+    if not os.path.exists(path):
+      return 1
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+      if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+      pos = len(SNAPSHOT_MAGIC)
+      (header_len,) = _HEADER_LEN.unpack_from(data, pos)
+      pos += _HEADER_LEN.size
+      header = json.loads(data[pos:pos + header_len])
+      body = pos + header_len
+      for meta in header["users"]:
+        start = body + meta["offset"]
+        events = _column_events(json.loads(data[start:start + meta["length"]]))
+        self._restore_user(meta, events)
+        self.recovered_events += len(events)
+    return header["next_segment"]
+
+  def _restore_user(self, meta: Dict, events: List[EventRecord]) -> None:
+    user = StoredUser.model_construct(
+      id=meta["id"],
+      name=meta["name"],
+      email=meta["email"],
+      password=meta["password"],
+      events={e.id: e for e in events},
+    )
+    self._users[user.id] = user
+    self._email_index[normalize_email(user.email)] = user.id
+    self._event_indexes[user.id] = EventIndex.from_records(events)
+    self._seq_indexes[user.id] = SeqIndex(events)
+    self._seq_counters[user.id] = count(meta["next_seq"])
+    self._versions[user.id] = meta["version"]
+    # older changes are gone: clients behind the snapshot resync in full
+    self._change_logs[user.id] = deque(maxlen=self.CHANGE_LOG_SIZE)
+
+  # --- snapshots -------------------------------------------------------
+
+  def _capture(self) -> Tuple[int, List[Tuple[Dict, List[EventRecord]]]]:
+    """Consistent copy of the store and the segment the log continues in.
+
+    Holds every lock for the length of a shallow copy; records are never
+    modified once stored, so sharing them with the snapshot writer is safe.
+    """
+    locks = [self._users_lock, *self._stripes]
+    for lock in locks:
+      lock.acquire()
+    try:
+      next_segment = self._wal.rotate()
+      users = []
+      for user_id, user in self._users.items():
+        next_seq = next(self._seq_counters[user_id])
+        self._seq_counters[user_id] = count(next_seq)  # put the peeked value back
+        meta = {
+          "id": user.id,
+          "name": user.name,
+          "email": user.email,
+          "password": user.password,
+          "version": self._versions[user_id],
+          "next_seq": next_seq,
+        }
+        users.append((meta, list(user.events.values())))
+      return next_segment, users
+    finally:
+      for lock in reversed(locks):
+        lock.release()
+
+  def snapshot(self) -> None:
+    """Write a snapshot of the current state and drop the log it replaces"""
+    with self._snapshot_lock:
+      next_segment, users = self._capture()
+      path = os.path.join(self.directory, SNAPSHOT_NAME)
+      tmp = path + ".tmp"
+      with open(tmp, "wb") as f:
+        bodies = []
+        offset = 0
+        for meta, events in users:
+          body = json.dumps(_event_columns(events), separators=(",", ":")).encode()
+          meta["offset"] = offset
+          meta["length"] = len(body)
+          offset += len(body)
+          bodies.append(body)
+        header = json.dumps(
+          {"next_segment": next_segment, "users": [meta for meta, _ in users]},
+          separators=(",", ":"),
+        ).encode()
+        f.write(SNAPSHOT_MAGIC + _HEADER_LEN.pack(len(header)) + header)
+        for body in bodies:
+          f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+      os.replace(tmp, path)
+      _fsync_dir(self.directory)
+      for number, segment in self._segments():
+        if number < next_segment:
+          os.remove(segment)
+
+  def _snapshot_in_background(self) -> None:
+    if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+      return
+    self._snapshot_thread = threading.Thread(target=self._snapshot_safely, daemon=True)
+    self._snapshot_thread.start()
+
+  def _snapshot_safely(self) -> None:
+    try:
+      self.snapshot()
+    except Exception as e:
+      print(f"Snapshot of {self.directory} failed: {e!r}")
+
+  def close(self) -> None:
+    if self._snapshot_thread is not None:
+      self._snapshot_thread.join()
+    if self._wal is not None:
+      self._wal.close()
+    self._lock_file.close()  # releases the flock
+
+  def stats(self) -> Dict:
+    return {
+      "records": self._wal.records,
+      "flushes": self._wal.flushes,
+      "segment": self._wal.segment,
+      "wal_bytes": self._wal.bytes_since_rotate,
+      "recovered_events": self.recovered_events,
+      "replayed_records": self.replayed_records,
+    }
@@ -0,0 +1,128 @@
+import bisect
+import heapq
+from typing import List
+
+from app.utils.ical import EventRecord
+
+
+class EventIndex:
+  """Per-user events kept sorted by start time for range lookups.
+
+  overlapping(start, end) bisects to the first event that could still be
+  running at ``start`` and walks forward until events begin at or after
+  ``end``, so a week view costs O(log n + k). Only events no longer than
+  ``LONG_EVENT`` seconds are kept in the sorted arrays, which bounds how far
+  back that first event can be; longer ones (multi-day trips, all-week
+  blocks) are few and sit in a separate list that is checked one by one.
+
+  Records without a parseable DTSTART are not indexed.
+  """
+
+  LONG_EVENT = 24 * 3600
+
+  __slots__ = ("_starts", "_records", "_long")
+
+  def __init__(self) -> None:
+    self._starts: List[int] = []
+    self._records: List[EventRecord] = []
+    self._long: List[EventRecord] = []
+
+  @classmethod
+  def from_records(cls, records: List[EventRecord]) -> "EventIndex":
+    """Index built with one sort instead of an insert per record"""
+    index = cls()
+    dated = sorted((r for r in records if r.start is not None), key=lambda r: r.start)
+    index._long = [r for r in dated if _duration(r) > cls.LONG_EVENT]
+    if index._long:
+      dated = [r for r in dated if _duration(r) <= cls.LONG_EVENT]
+    index._starts = [r.start for r in dated]
+    index._records = dated
+    return index
+
+  def __len__(self) -> int:
+    return len(self._records) + len(self._long)
+
+  def add(self, record: EventRecord) -> None:
+    if record.start is None:
+      return
+    if _duration(record) > self.LONG_EVENT:
+      self._long.append(record)
+      return
+    pos = bisect.bisect_right(self._starts, record.start)
+    self._starts.insert(pos, record.start)
+    self._records.insert(pos, record)
+
+  def remove(self, record: EventRecord) -> None:
+    if record.start is None:
+      return
+    if _duration(record) > self.LONG_EVENT:
+      for pos, other in enumerate(self._long):
+        if other is record:
+          del self._long[pos]
+          break
+      return
+    pos = bisect.bisect_left(self._starts, record.start)
+    while pos < len(self._starts) and self._starts[pos] == record.start:
+      if self._records[pos] is record:
+        del self._starts[pos]
+        del self._records[pos]
+        return
+      pos += 1
+
+  def overlapping(self, start: int, end: int) -> List[EventRecord]:
+    """Events intersecting the half-open interval [start, end), by start time"""
+    lo = bisect.bisect_left(self._starts, start - self.LONG_EVENT)
+    hi = bisect.bisect_left(self._starts, end)
+    result = [r for r in self._records[lo:hi] if _overlaps(r, start, end)]
+    long_hits = [r for r in self._long if _overlaps(r, start, end)]
+    if long_hits:
+      result = list(heapq.merge(result, sorted(long_hits, key=_start), key=_start))
+    return result
+
+
+def _start(record: EventRecord) -> int:
+  return record.start
+
+
+def _duration(record: EventRecord) -> int:
+  return (record.end or record.start) - record.start
+
+
+def _overlaps(record: EventRecord, start: int, end: int) -> bool:
+  if record.start >= end:
+    return False
+  record_end = record.end if record.end is not None else record.start
+  # zero-length events count if they fall inside the window
+  return record_end > start or record.start >= start
+
+
+class SeqIndex:
+  """Per-user events in insertion (seq) order for cursor pagination.
+
+  Seqs are handed out in increasing order, so inserts are appends and
+  after(seq, limit) bisects straight to the page: O(log n + limit).
+  """
+
+  __slots__ = ("_seqs", "_records")
+
+  def __init__(self, records: List[EventRecord] = ()) -> None:
+    self._seqs: List[int] = [r.seq for r in records]
+    self._records: List[EventRecord] = list(records)
+
+  def add(self, record: EventRecord) -> None:
+    self._seqs.append(record.seq)
+    self._records.append(record)
+
+  def replace(self, record: EventRecord) -> None:
+    """Swap in the new record for an event, matched by its (kept) seq"""
+    pos = bisect.bisect_left(self._seqs, record.seq)
+    self._records[pos] = record
+
+  def remove(self, record: EventRecord) -> None:
+    pos = bisect.bisect_left(self._seqs, record.seq)
+    del self._seqs[pos]
+    del self._records[pos]
+
+  def after(self, seq: int, limit: int) -> List[EventRecord]:
+    pos = bisect.bisect_right(self._seqs, seq)
+    return self._records[pos:pos + limit]
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from sqlalchemy import JSON, BigInteger, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+  pass
+
+
+class UserModel(Base):
+  __tablename__ = "users"
+
+  id: Mapped[str] = mapped_column(String(36), primary_key=True)
+  name: Mapped[str] = mapped_column(String(255))
+  email: Mapped[str] = mapped_column(String(320))
+  # Lower-cased email; unique index backs get_by_email
+  email_normalized: Mapped[str] = mapped_column(String(320), unique=True, index=True)
+  password: Mapped[str] = mapped_column(String(255))  # NOTE: plaintext for demo
+  # Bumped in the same transaction as every event mutation
+  version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+
+
+class EventModel(Base):
+  __tablename__ = "events"
+
+  # Autoincrement id doubles as insertion order, so event_index is the
+  # rank of a row among the user's events ordered by id.
+  id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+  user_id: Mapped[str] = mapped_column(
+    String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True
+  )
+  # Stable per-user event id (VEVENT UID or generated)
+  event_id: Mapped[str] = mapped_column(String(255))
+  # Epoch seconds parsed from DTSTART/DTEND, for range queries
+  start_ts: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+  end_ts: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+  payload: Mapped[dict] = mapped_column(JSON)
+
+  __table_args__ = (
+    Index("ix_events_user_start", "user_id", "start_ts"),
+    UniqueConstraint("user_id", "event_id", name="uq_events_user_event"),
+  )
+
+
+class ChangeModel(Base):
+  """Bounded per-user change log backing delta sync"""
+  __tablename__ = "event_changes"
+
+  id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+  user_id: Mapped[str] = mapped_column(
+    String(36), ForeignKey("users.id", ondelete="CASCADE")
+  )
+  version: Mapped[int] = mapped_column(Integer)
+  op: Mapped[str] = mapped_column(String(10))
+  event_id: Mapped[str] = mapped_column(String(255))
+  payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+
+  __table_args__ = (Index("ix_event_changes_user_version", "user_id", "version"),)
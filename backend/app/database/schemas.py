@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 
 
@@ -26,6 +26,11 @@ class TokenResponse(BaseModel):
 
 class ScheduleRequest(BaseModel):
   prompt: str
+  # Latency budget; when set, the rule-based result is returned if the LLM
+  # has not answered in time
+  deadline_ms: Optional[int] = Field(default=None, ge=1)
+  # Whose turn it is in the fair LLM queue; the client address when unset
+  user_id: Optional[str] = None
 
 
 class EventItem(BaseModel):
@@ -40,3 +45,28 @@ class EventItem(BaseModel):
 class ScheduleResponse(BaseModel):
   events: List[EventItem]
   summary: str = ""  # Optional summary of what was generated
+  source: str = ""  # "ollama", "cache", "semantic_cache" or "fallback"
+
+
+class BatchScheduleRequest(BaseModel):
+  requests: List[ScheduleRequest]
+  stream: bool = False  # NDJSON lines in completion order instead of one ordered list
+
+
+class BatchScheduleResponse(BaseModel):
+  results: List[ScheduleResponse]  # same order as the requests
+
+
+class ScheduleJobRequest(ScheduleRequest):
+  # Add the generated events to user_id's calendar when the job finishes
+  auto_insert: bool = False
+
+
+class ScheduleJob(BaseModel):
+  job_id: str
+  status: str  # "queued", "running", "done" or "failed"
+  created_at: str
+  finished_at: Optional[str] = None
+  result: Optional[ScheduleResponse] = None
+  error: Optional[str] = None
+  event_ids: List[str] = []  # ids of the events inserted by auto_insert
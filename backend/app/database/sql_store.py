@@ -0,0 +1,414 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, event as sa_event, func, insert, inspect, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database.connection import (
+  Change,
+  EventConflictError,
+  EventNotFoundError,
+  InMemoryDB,
+  StoredUser,
+  normalize_email,
+)
+from app.database.models import Base, ChangeModel, EventModel, UserModel
+from app.utils import config
+from app.utils.ical import EventRecord
+
+# Same bound as InMemoryDB.CHANGE_LOG_SIZE
+CHANGE_LOG_SIZE = InMemoryDB.CHANGE_LOG_SIZE
+
+
+def make_engine(url: str = None):
+  """Create an engine with a pool tuned for the configured database.
+
+  SQLite gets check_same_thread disabled (routes run in a threadpool),
+  foreign keys enforced on every connection (so deleting a user cascades)
+  and an in-memory database shares a single connection so every session
+  sees the same data. Server databases get a bounded QueuePool with pre-ping and
+  periodic recycling so idle connections dropped by the server are replaced.
+  """
+  url = url or config.DATABASE_URL
+  if url.startswith("sqlite"):
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if ":memory:" in url or url in ("sqlite://", "sqlite+pysqlite://"):
+      kwargs["poolclass"] = StaticPool
+    engine = create_engine(url, **kwargs)
+    sa_event.listen(engine, "connect", _enable_foreign_keys)
+    return engine
+
+  return create_engine(
+    url,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
+    pool_recycle=config.DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+  )
+
+
+def _enable_foreign_keys(dbapi_connection, _record) -> None:
+  cursor = dbapi_connection.cursor()
+  cursor.execute("PRAGMA foreign_keys=ON")
+  cursor.close()
+
+
+def migrate_schema(engine) -> None:
+  """Bring tables created by an older version up to date.
+
+  create_all() only creates missing tables, never missing columns. Columns
+  that are nullable or have a server default are added in place; a missing
+  column that needs a value for existing rows raises RuntimeError here
+  rather than on the first query that touches it.
+  """
+  inspector = inspect(engine)
+  quote = engine.dialect.identifier_preparer.quote
+  additions, missing = [], []
+  for table in Base.metadata.sorted_tables:
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    for column in table.columns:
+      if column.name in existing:
+        continue
+      if column.nullable or column.server_default is not None:
+        additions.append((table, column))
+      else:
+        missing.append(f"{table.name}.{column.name}")
+  if missing:
+    raise RuntimeError(
+      f"Database schema is out of date, missing {', '.join(missing)}; "
+      "migrate it or point DATABASE_URL at a new database"
+    )
+  with engine.begin() as conn:
+    for table, column in additions:
+      ddl = (
+        f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} "
+        f"{column.type.compile(engine.dialect)}"
+      )
+      if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+      print(f"Adding column {table.name}.{column.name}")
+      conn.execute(text(ddl))
+
+
+def _event_row(user_id: str, event: EventRecord) -> dict:
+  return {
+    "user_id": user_id,
+    "event_id": event.id,
+    "start_ts": event.start,
+    "end_ts": event.end,
+    "payload": event.to_dict(),
+  }
+
+
+def _to_record(row_id: int, payload: dict) -> EventRecord:
+  # The autoincrement primary key serves as the event's insertion seq
+  record = EventRecord.from_dict(payload)
+  record.seq = row_id
+  return record
+
+
+class SQLDB:
+  """SQLAlchemy-backed store exposing the same interface as InMemoryDB"""
+
+  def __init__(self, url: str = None, engine=None) -> None:
+    self.engine = engine or make_engine(url)
+    Base.metadata.create_all(self.engine)
+    migrate_schema(self.engine)
+    self._session = sessionmaker(self.engine, expire_on_commit=False)
+
+  def _load_events(
+    self, session: Session, user_id: str, after_seq: int = 0, limit: int = None
+  ) -> List[EventRecord]:
+    query = (
+      select(EventModel.id, EventModel.payload)
+      .where(EventModel.user_id == user_id, EventModel.id > after_seq)
+      .order_by(EventModel.id)
+    )
+    if limit is not None:
+      query = query.limit(limit)
+    return [_to_record(row_id, payload) for row_id, payload in session.execute(query)]
+
+  def _to_stored(self, row: UserModel) -> StoredUser:
+    # Events are not loaded: lookups are for auth and existence checks, and
+    # get_events()/get_events_page() read them when they are needed
+    return StoredUser(
+      id=row.id,
+      name=row.name,
+      email=row.email,
+      password=row.password,
+    )
+
+  def _row_at(self, session: Session, user_id: str, event_index: int) -> EventModel:
+    """Resolve a list position to the event row (compatibility only)"""
+    if event_index < 0:
+      raise ValueError(f"Event index {event_index} out of range")
+    row = session.execute(
+      select(EventModel)
+      .where(EventModel.user_id == user_id)
+      .order_by(EventModel.id)
+      .offset(event_index)
+      .limit(1)
+    ).scalar()
+    if row is None:
+      raise ValueError(f"Event index {event_index} out of range")
+    return row
+
+  def _row_for(self, session: Session, user_id: str, event_id: str) -> EventModel:
+    row = session.execute(
+      select(EventModel).where(
+        EventModel.user_id == user_id, EventModel.event_id == event_id
+      )
+    ).scalar_one_or_none()
+    if row is None:
+      raise EventNotFoundError(f"Event {event_id} not found")
+    return row
+
+  def _replace(self, row: EventModel, event: EventRecord) -> None:
+    event.id = row.event_id
+    event.seq = row.id
+    row.start_ts = event.start
+    row.end_ts = event.end
+    row.payload = event.to_dict()
+
+  def _require_user(self, session: Session, user_id: str) -> None:
+    if session.get(UserModel, user_id) is None:
+      raise ValueError(f"User not found with ID: {user_id}")
+
+  def _bump_version(self, session: Session, user_id: str, count: int = 1) -> int:
+    """Add ``count`` to the user's version and return the new value.
+
+    The UPDATE also locks the user row, serializing writers across workers.
+    """
+    result = session.execute(
+      update(UserModel)
+      .where(UserModel.id == user_id)
+      .values(version=UserModel.version + count)
+    )
+    if result.rowcount == 0:
+      raise ValueError(f"User not found with ID: {user_id}")
+    return session.execute(
+      select(UserModel.version).where(UserModel.id == user_id)
+    ).scalar_one()
+
+  def _record_changes(self, session: Session, user_id: str, changes: List[Tuple]) -> None:
+    """Bump the version once per (op, event_id, payload) and log each change"""
+    if not changes:
+      return
+    version = self._bump_version(session, user_id, len(changes))
+    first = version - len(changes) + 1
+    session.execute(insert(ChangeModel), [
+      {"user_id": user_id, "version": first + i, "op": op, "event_id": event_id, "payload": payload}
+      for i, (op, event_id, payload) in enumerate(changes)
+    ])
+    session.execute(
+      delete(ChangeModel).where(
+        ChangeModel.user_id == user_id,
+        ChangeModel.version <= version - CHANGE_LOG_SIZE,
+      )
+    )
+
+  def count_users(self) -> int:
+    with self._session() as session:
+      return session.execute(select(func.count()).select_from(UserModel)).scalar_one()
+
+  def get_by_email(self, email: str) -> Optional[StoredUser]:
+    with self._session() as session:
+      row = session.execute(
+        select(UserModel).where(UserModel.email_normalized == normalize_email(email))
+      ).scalar_one_or_none()
+      return self._to_stored(row) if row else None
+
+  def get_by_id(self, user_id: str) -> Optional[StoredUser]:
+    """Get user by ID"""
+    with self._session() as session:
+      row = session.get(UserModel, user_id)
+      return self._to_stored(row) if row else None
+
+  def create_user(self, user: StoredUser) -> StoredUser:
+    """Insert a user, enforcing a unique (case-insensitive) email"""
+    try:
+      with self._session.begin() as session:
+        session.add(UserModel(
+          id=user.id,
+          name=user.name,
+          email=user.email,
+          email_normalized=normalize_email(user.email),
+          password=user.password,
+        ))
+        session.flush()
+        if user.events:
+          session.execute(
+            insert(EventModel),
+            [_event_row(user.id, e) for e in user.events.values()],
+          )
+    except IntegrityError:
+      raise ValueError(f"Email already registered: {user.email}")
+    return user
+
+  def add_event(self, user_id: str, event: EventRecord) -> None:
+    self.add_events(user_id, [event])
+
+  def add_events(self, user_id: str, events: Iterable[EventRecord]) -> None:
+    """Append several events in one transaction with a single executemany"""
+    rows = [_event_row(user_id, e) for e in events]
+    try:
+      with self._session.begin() as session:
+        self._require_user(session, user_id)
+        if rows:
+          session.execute(insert(EventModel), rows)
+          self._record_changes(
+            session, user_id, [("add", r["event_id"], r["payload"]) for r in rows]
+          )
+    except IntegrityError:
+      raise EventConflictError("Event already exists")
+
+  def try_add_events(self, user_id: str, events: Iterable[EventRecord]) -> List[Optional[str]]:
+    """Append the events whose ids are free in one transaction; one entry
+    per event, None if it was stored, else the reason it was not"""
+    events = list(events)
+    results: List[Optional[str]] = []
+    rows = []
+    with self._session.begin() as session:
+      self._require_user(session, user_id)
+      taken = set(session.execute(
+        select(EventModel.event_id).where(
+          EventModel.user_id == user_id,
+          EventModel.event_id.in_([e.id for e in events]),
+        )
+      ).scalars())
+      for event in events:
+        if event.id in taken:
+          results.append(f"Event {event.id} already exists")
+          continue
+        taken.add(event.id)
+        rows.append(_event_row(user_id, event))
+        results.append(None)
+      if rows:
+        session.execute(insert(EventModel), rows)
+        self._record_changes(
+          session, user_id, [("add", r["event_id"], r["payload"]) for r in rows]
+        )
+    return results
+
+  def update_event(self, user_id: str, event_index: int, event: EventRecord) -> None:
+    """Update an event at the given index for a user"""
+    with self._session.begin() as session:
+      self._require_user(session, user_id)
+      row = self._row_at(session, user_id, event_index)
+      self._replace(row, event)
+      self._record_changes(session, user_id, [("update", row.event_id, row.payload)])
+
+  def delete_event(self, user_id: str, event_index: int) -> None:
+    """Delete an event at the given index for a user"""
+    with self._session.begin() as session:
+      self._require_user(session, user_id)
+      row = self._row_at(session, user_id, event_index)
+      session.delete(row)
+      self._record_changes(session, user_id, [("delete", row.event_id, None)])
+
+  def update_event_by_id(self, user_id: str, event_id: str, event: EventRecord) -> None:
+    """Replace the event with the given stable id"""
+    with self._session.begin() as session:
+      self._require_user(session, user_id)
+      row = self._row_for(session, user_id, event_id)
+      self._replace(row, event)
+      self._record_changes(session, user_id, [("update", event_id, row.payload)])
+
+  def delete_event_by_id(self, user_id: str, event_id: str) -> None:
+    """Delete the event with the given stable id"""
+    with self._session.begin() as session:
+      self._require_user(session, user_id)
+      result = session.execute(
+        delete(EventModel).where(
+          EventModel.user_id == user_id, EventModel.event_id == event_id
+        )
+      )
+      if result.rowcount == 0:
+        raise EventNotFoundError(f"Event {event_id} not found")
+      self._record_changes(session, user_id, [("delete", event_id, None)])
+
+  def get_events(self, user_id: str) -> List[EventRecord]:
+    """A user's events in insertion order"""
+    with self._session() as session:
+      self._require_user(session, user_id)
+      return self._load_events(session, user_id)
+
+  def get_version(self, user_id: str) -> int:
+    """Counter bumped on every change to the user's events"""
+    with self._session() as session:
+      version = session.execute(
+        select(UserModel.version).where(UserModel.id == user_id)
+      ).scalar_one_or_none()
+      if version is None:
+        raise ValueError(f"User not found with ID: {user_id}")
+      return version
+
+  def get_events_versioned(self, user_id: str) -> Tuple[int, List[EventRecord]]:
+    """Events snapshot together with the version it corresponds to"""
+    with self._session.begin() as session:
+      version = session.execute(
+        select(UserModel.version).where(UserModel.id == user_id)
+      ).scalar_one_or_none()
+      if version is None:
+        raise ValueError(f"User not found with ID: {user_id}")
+      return version, self._load_events(session, user_id)
+
+  def get_changes(self, user_id: str, since: int) -> Tuple[int, Optional[List[Change]]]:
+    """Changes after version ``since`` and the current version.
+
+    The change list is None when ``since`` is no longer covered by the log
+    (or is ahead of the store), meaning the client has to refetch everything.
+    """
+    with self._session() as session:
+      version = session.execute(
+        select(UserModel.version).where(UserModel.id == user_id)
+      ).scalar_one_or_none()
+      if version is None:
+        raise ValueError(f"User not found with ID: {user_id}")
+      if since > version:
+        return version, None
+      if since == version:
+        return version, []
+      rows = session.execute(
+        select(ChangeModel)
+        .where(ChangeModel.user_id == user_id, ChangeModel.version > since)
+        .order_by(ChangeModel.version)
+      ).scalars().all()
+      if not rows or rows[0].version != since + 1:
+        return version, None
+      return version, [
+        Change(
+          r.version,
+          r.op,
+          r.event_id,
+          EventRecord.from_dict(r.payload) if r.payload is not None else None,
+        )
+        for r in rows
+      ]
+
+  def get_events_page(self, user_id: str, after_seq: int, limit: int) -> List[EventRecord]:
+    """Up to ``limit`` events inserted after ``after_seq``, in insertion order"""
+    with self._session() as session:
+      self._require_user(session, user_id)
+      return self._load_events(session, user_id, after_seq, limit)
+
+  def get_events_in_range(self, user_id: str, start: int, end: int) -> List[EventRecord]:
+    """Events overlapping [start, end) (epoch seconds), ordered by start"""
+    with self._session() as session:
+      self._require_user(session, user_id)
+      rows = session.execute(
+        select(EventModel.id, EventModel.payload)
+        .where(
+          EventModel.user_id == user_id,
+          EventModel.start_ts < end,
+          or_(EventModel.end_ts > start, EventModel.start_ts >= start),
+        )
+        .order_by(EventModel.start_ts, EventModel.id)
+      )
+      return [_to_record(row_id, payload) for row_id, payload in rows]
+
+  def close(self) -> None:
+    """Close the pooled connections"""
+    self.engine.dispose()
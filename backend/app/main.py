@@ -4,10 +4,27 @@
 '''
 
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api.routes import auth, chat, users, health ,ai, events
+from app.api.routes.chat import job_manager
+from app.database.connection import db
+from app.services.ollama_service import model_registry, ollama_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    model_registry.start()
+    job_manager.start()
+    yield
+    await job_manager.stop()
+    await model_registry.stop()
+    await ollama_client.aclose()
+    db.close()
+
 
-app = FastAPI(title="Flutter + FastAPI + OpenAI")
+app = FastAPI(title="Flutter + FastAPI + OpenAI", lifespan=lifespan)
 
 app.include_router(health.router)
 app.include_router(users.router)
@@ -0,0 +1,161 @@
+"""
+Admission control for LLM generations.
+
+At most ``workers`` generations run at once. Callers beyond that wait in a
+bounded queue that is served by priority class first (interactive before
+batch) and round-robin across users within a class, so one user's burst
+cannot starve everyone else. When the queue is full the caller is turned
+away at once with QueueFullError, which carries a Retry-After estimate.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, List
+
+from app.services.llm_router import LatencyTracker
+from app.utils import config
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = ("interactive", "batch")
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded, fair, two-class queue in front of a fixed number of workers.
+
+    ``max_queue`` bounds all waiting callers; batch callers may only take
+    ``max_batch_queue`` of those places so a large batch cannot lock
+    interactive users out.
+    """
+
+    def __init__(
+        self,
+        workers: int = config.LLM_WORKERS,
+        max_queue: int = config.LLM_QUEUE_SIZE,
+        max_batch_queue: int = config.LLM_BATCH_QUEUE_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_batch_queue = min(max_batch_queue, max_queue)
+        self.clock = clock
+        self.running = 0
+        # per priority class: user -> waiters, in round-robin order
+        self._queues: List["OrderedDict[str, Deque[asyncio.Future]]"] = [
+            OrderedDict() for _ in PRIORITY_NAMES
+        ]
+        self._depth = [0 for _ in PRIORITY_NAMES]
+        self.admitted = [0 for _ in PRIORITY_NAMES]
+        self.rejected = [0 for _ in PRIORITY_NAMES]
+        self.wait_times = LatencyTracker()
+        self.service_times = LatencyTracker()
+
+    @property
+    def depth(self) -> int:
+        return sum(self._depth)
+
+    def retry_after(self) -> int:
+        """Seconds until a place is likely to free up, at least 1"""
+        per_call = self.service_times.p50 or config.LLM_HEDGE_DELAY
+        return max(1, math.ceil((self.depth + 1) * per_call / self.workers))
+
+    def check(self, priority: int = INTERACTIVE) -> None:
+        """Raise QueueFullError if a caller of this class would be turned away now"""
+        if self.running < self.workers and self.depth == 0:
+            return
+        if self.depth >= self.max_queue or (
+            priority == BATCH and self._depth[BATCH] >= self.max_batch_queue
+        ):
+            self.rejected[priority] += 1
+            raise QueueFullError(self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, user: str, priority: int = INTERACTIVE) -> AsyncIterator[None]:
+        """Hold one worker slot for the body of the ``async with`` block"""
+        enqueued = self.clock()
+        if self.running < self.workers and self.depth == 0:
+            self.running += 1
+        else:
+            self.check(priority)
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues[priority].setdefault(user, deque()).append(waiter)
+            self._depth[priority] += 1
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.cancelled():
+                    self._forget(priority, user, waiter)
+                else:
+                    self._release()  # the slot was handed over just as we were cancelled
+                raise
+
+        self.admitted[priority] += 1
+        self.wait_times.record(self.clock() - enqueued)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.service_times.record(self.clock() - started)
+            self._release()
+
+    def _forget(self, priority: int, user: str, waiter: asyncio.Future) -> None:
+        waiters = self._queues[priority].get(user)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self._depth[priority] -= 1
+            if not waiters:
+                del self._queues[priority][user]
+
+    def _release(self) -> None:
+        """Hand the slot to the next waiter, or free it"""
+        for priority, users in enumerate(self._queues):
+            while users:
+                user, waiters = next(iter(users.items()))
+                waiter = waiters.popleft()
+                self._depth[priority] -= 1
+                if waiters:
+                    users.move_to_end(user)  # round-robin: user goes to the back
+                else:
+                    del users[user]
+                if not waiter.done():
+                    waiter.set_result(None)  # slot passes on; running is unchanged
+                    return
+        self.running -= 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.depth,
+            "max_queue": self.max_queue,
+            "classes": {
+                name: {
+                    "queued": self._depth[i],
+                    "users": len(self._queues[i]),
+                    "admitted": self.admitted[i],
+                    "rejected": self.rejected[i],
+                }
+                for i, name in enumerate(PRIORITY_NAMES)
+            },
+            "wait_ms": {
+                "p50": _ms(self.wait_times.p50),
+                "p95": _ms(self.wait_times.p95),
+            },
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000)
+
+
+# Shared by every route that calls an LLM
+llm_admission = AdmissionController()
@@ -0,0 +1,206 @@
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from app.utils import config
+from app.utils.ical import EventRecord, escape_text, render_vevent
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response bytes"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header against our (strong) ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ListingCache:
+    """Serialized GET /events/{user_id} bodies, one entry per user.
+
+    Entries are keyed by the store's per-user version, so any mutation makes
+    the cached body stale without explicit invalidation. Least recently used
+    users are evicted beyond ``max_entries`` entries or ``max_bytes`` of
+    bodies; a body larger than ``max_bytes`` is not cached.
+    """
+
+    def __init__(
+        self, max_entries: int = 10_000, max_bytes: int = config.LISTING_CACHE_MAX_BYTES
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[int, str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, version: int) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1], entry[2]
+
+    def put(self, user_id: str, version: int, body: bytes) -> str:
+        etag = make_etag(body)
+        with self._lock:
+            current = self._entries.get(user_id)
+            # never replace a newer body with one built from an older snapshot
+            if current is None or current[0] <= version:
+                if current is not None:
+                    self._evict(user_id)
+                if len(body) <= self.max_bytes:
+                    self._entries[user_id] = (version, etag, body)
+                    self.size_bytes += len(body)
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+        return etag
+
+    def _evict(self, user_id: str) -> None:
+        self.size_bytes -= len(self._entries.pop(user_id)[2])
+
+
+class _Feed:
+    """One user's rendered calendar feed and the per-event chunks it is built from"""
+
+    def __init__(self) -> None:
+        self.version = -1
+        # event id -> (record, its VTIMEZONE blocks, rendered VEVENT), in insertion order
+        self.chunks: Dict[str, Tuple[EventRecord, Tuple[str, ...], bytes]] = {}
+        self.timezones: Counter = Counter()  # VTIMEZONE text -> events using it
+        self.etag = ""
+        self.body = b""
+        self.last_modified = 0  # epoch seconds
+        self.size = 0  # bytes of body and chunks, as last counted by FeedCache
+        self.lock = threading.Lock()
+
+    def render(self, event: EventRecord) -> None:
+        """(Re-)render one event; an updated event keeps its position"""
+        old = self.chunks.get(event.id)
+        if old is not None:
+            self.timezones.subtract(old[1])
+        timezones, text = render_vevent(event)
+        self.keep(event, (event, timezones, text.encode()))
+
+    def keep(self, event: EventRecord, chunk) -> None:
+        self.chunks[event.id] = chunk
+        self.timezones.update(chunk[1])
+
+    def drop(self, event_id: str) -> None:
+        old = self.chunks.pop(event_id, None)
+        if old is not None:
+            self.timezones.subtract(old[1])
+
+
+class FeedCache:
+    """Rendered GET /events/{user_id}/calendar.ics bodies, one entry per user.
+
+    Each event is rendered once into a chunk. When the store's version for
+    a user moves on, only the events named in its change log are rendered
+    again and the body is re-joined from the chunks; if the change log no
+    longer reaches back far enough, events whose record is unchanged still
+    reuse their chunk. Least recently used users are evicted beyond
+    ``max_entries`` feeds or ``max_bytes`` of bodies and chunks; a feed
+    larger than ``max_bytes`` on its own is served but not kept.
+    """
+
+    HEADER = "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//AI Calendar//Feed//EN\r\nCALSCALE:GREGORIAN\r\n"
+    FOOTER = b"END:VCALENDAR\r\n"
+
+    def __init__(
+        self,
+        max_entries: int = 1_000,
+        max_bytes: int = config.FEED_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.renders = 0  # events rendered, for stats
+        self.size_bytes = 0
+        self._feeds: "OrderedDict[str, _Feed]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _feed(self, user_id: str) -> _Feed:
+        with self._lock:
+            feed = self._feeds.get(user_id)
+            if feed is None:
+                feed = self._feeds[user_id] = _Feed()
+            self._feeds.move_to_end(user_id)
+            while len(self._feeds) > self.max_entries:
+                self._evict(next(iter(self._feeds)))
+            return feed
+
+    def _evict(self, user_id: str) -> None:
+        self.size_bytes -= self._feeds.pop(user_id).size
+
+    def _account(self, user_id: str, feed: _Feed) -> None:
+        """Count a refreshed feed's new size and evict down to ``max_bytes``"""
+        size = len(feed.body) + sum(len(chunk) for _, _, chunk in feed.chunks.values())
+        with self._lock:
+            if self._feeds.get(user_id) is not feed:
+                return  # evicted while it was being refreshed
+            self.size_bytes += size - feed.size
+            feed.size = size
+            if size > self.max_bytes:
+                self._evict(user_id)
+            while self.size_bytes > self.max_bytes:
+                self._evict(next(iter(self._feeds)))
+
+    def get(self, db, user_id: str, name: str = "") -> Tuple[str, float, bytes]:
+        """(ETag, last-modified epoch, body) of the user's feed, brought up to date"""
+        feed = self._feed(user_id)
+        with feed.lock:
+            if db.get_version(user_id) != feed.version:
+                self._refresh(db, user_id, name, feed)
+                self._account(user_id, feed)
+            return feed.etag, feed.last_modified, feed.body
+
+    def _refresh(self, db, user_id: str, name: str, feed: _Feed) -> None:
+        now = self.clock()
+        version, changes = db.get_changes(user_id, feed.version) if feed.version >= 0 else (0, None)
+        if changes is None:
+            version, events = db.get_events_versioned(user_id)
+            old = feed.chunks
+            feed.chunks = {}
+            feed.timezones = Counter()
+            for event in events:
+                cached = old.get(event.id)
+                if cached is not None and cached[0] is event:
+                    feed.keep(event, cached)
+                else:
+                    feed.render(event)
+                    self.renders += 1
+        else:
+            for change in changes:
+                if change.op == "delete":
+                    feed.drop(change.event_id)
+                else:
+                    feed.render(change.event)
+                    self.renders += 1
+
+        calendar = self.HEADER + (f"X-WR-CALNAME:{escape_text(name)}\r\n" if name else "")
+        feed.timezones = +feed.timezones  # drop blocks no event uses any more
+        feed.body = b"".join([
+            (calendar + "".join(sorted(feed.timezones))).encode(),
+            *(chunk for _, _, chunk in feed.chunks.values()),
+            self.FOOTER,
+        ])
+        etag = make_etag(feed.body)
+        if etag != feed.etag:
+            # whole seconds like the header, and always later than the last
+            # stamp, so a change in the same second as the previous rebuild
+            # is not answered with 304 by an If-Modified-Since poll
+            feed.last_modified = max(math.ceil(now), feed.last_modified + 1)
+        feed.etag = etag
+        feed.version = version
@@ -1,16 +1,47 @@
-import os
+from uuid import uuid4
+
+from app.utils.ical import EventRecord, parse_vevent
 
 
 class EventsService:
+    """Parses VEVENT payloads once on write and hands records to the store"""
+
     def __init__(self, db):
         self.db = db
 
-    def add_event_to_user(self, user_id: str, event: dict) -> None:
-        self.db.add_event(user_id, event)
+    def _new_record(self, vevent: str) -> EventRecord:
+        record = parse_vevent(vevent)
+        record.id = record.id or str(uuid4())
+        return record
+
+    def add_event_to_user(self, user_id: str, vevent: str) -> str:
+        """Store a new event and return its stable id"""
+        record = self._new_record(vevent)
+        self.db.add_event(user_id, record)
+        return record.id
+
+    def add_events_to_user(self, user_id: str, vevents: list) -> list:
+        records = [self._new_record(v) for v in vevents]
+        self.db.add_events(user_id, records)
+        return [r.id for r in records]
 
-    def update_event_for_user(self, user_id: str, event_index: int, event: dict) -> None:
-        self.db.update_event(user_id, event_index, event)
+    def import_events(self, user_id: str, vevents: list) -> list:
+        """Store what can be stored; per VEVENT (event_id, None) or (None, error)"""
+        records = [self._new_record(v) for v in vevents]
+        errors = self.db.try_add_events(user_id, records)
+        return [
+            (record.id, None) if error is None else (None, error)
+            for record, error in zip(records, errors)
+        ]
+
+    def update_event_for_user(self, user_id: str, event_index: int, vevent: str) -> None:
+        self.db.update_event(user_id, event_index, parse_vevent(vevent))
 
     def delete_event_for_user(self, user_id: str, event_index: int) -> None:
         self.db.delete_event(user_id, event_index)
-        
\ No newline at end of file
+
+    def update_event_by_id(self, user_id: str, event_id: str, vevent: str) -> None:
+        self.db.update_event_by_id(user_id, event_id, parse_vevent(vevent))
+
+    def delete_event_by_id(self, user_id: str, event_id: str) -> None:
+        self.db.delete_event_by_id(user_id, event_id)
@@ -0,0 +1,237 @@
+"""
+Rule-based schedule generation used when no LLM answer is available.
+
+The rules live in a declarative table that is compiled once, at import:
+every distinct keyword is mapped to the rules it fires and fixed events are
+prebuilt as templates. Per prompt each keyword is looked up once and only
+the fired rules run. Matching keeps the substring semantics of the original
+``word in prompt_lower`` checks, so outputs are unchanged.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from app.database.schemas import EventItem, ScheduleResponse
+
+
+class EventSpec(NamedTuple):
+    title: str
+    hour: int
+    minute: int
+    duration: int  # minutes
+    location: str = ""
+    description: str = ""
+    use_prompt_time: bool = False  # start at the first time mentioned in the prompt
+    use_prompt_hours: bool = False  # duration from "<N> hour(s)" in the prompt
+
+
+class Variant(NamedTuple):
+    when: Tuple[str, ...]  # any of these keywords; empty = default
+    events: Tuple[EventSpec, ...]
+
+
+class Rule(NamedTuple):
+    name: str
+    triggers: Tuple[Tuple[str, ...], ...]  # fires if all keywords of any group match
+    variants: Tuple[Variant, ...]  # first matching variant is used
+
+
+def _any(*keywords: str) -> Tuple[Tuple[str, ...], ...]:
+    return tuple((k,) for k in keywords)
+
+
+# Order matters: events are appended rule by rule and then stably sorted
+# by start time, so ties keep this order.
+RULES: Tuple[Rule, ...] = (
+    Rule("wake", (("wake",), ("morning", "routine")), (
+        Variant((), (EventSpec("Wake Up", 6, 0, 15, "Home", "Morning wake up"),)),
+    )),
+    Rule("prayer", _any("pray", "prayer", "salah", "salat", "namaz"), (
+        Variant(("all", "every", "all of", "each"), (
+            EventSpec("Fajr Prayer", 5, 30, 30, "", "Prayer time"),
+            EventSpec("Dhuhr Prayer", 12, 30, 30, "", "Prayer time"),
+            EventSpec("Asr Prayer", 15, 30, 30, "", "Prayer time"),
+            EventSpec("Maghrib Prayer", 18, 30, 30, "", "Prayer time"),
+            EventSpec("Isha Prayer", 20, 0, 30, "", "Prayer time"),
+        )),
+        Variant(("fajr", "dawn"), (EventSpec("Fajr Prayer", 5, 30, 30, "", "Fajr Prayer"),)),
+        Variant(("dhuhr", "zuhr", "noon"), (EventSpec("Dhuhr Prayer", 12, 30, 30, "", "Dhuhr Prayer"),)),
+        Variant(("asr", "afternoon"), (EventSpec("Asr Prayer", 15, 30, 30, "", "Asr Prayer"),)),
+        Variant(("maghrib", "sunset"), (EventSpec("Maghrib Prayer", 18, 30, 30, "", "Maghrib Prayer"),)),
+        Variant(("isha", "night"), (EventSpec("Isha Prayer", 20, 0, 30, "", "Isha Prayer"),)),
+        Variant((), (EventSpec("Prayer", 12, 0, 30, "", "Prayer"),)),
+    )),
+    Rule("meal", _any("breakfast", "eat", "meal", "food", "lunch", "dinner"), (
+        Variant(("breakfast",), (EventSpec("Breakfast", 8, 0, 30, "Kitchen", "Morning meal"),)),
+        Variant(("lunch",), (EventSpec("Lunch", 13, 0, 45, "", "Midday meal"),)),
+        Variant(("dinner",), (EventSpec("Dinner", 19, 0, 60, "", "Evening meal"),)),
+        Variant((), (EventSpec("Meal", 8, 0, 30, "Kitchen", "Meal time"),)),
+    )),
+    Rule("study", _any("study", "learn", "homework", "read", "research"), (
+        Variant((), (EventSpec(
+            "Study Session", 9, 0, 120, "", "Study time", use_prompt_time=True, use_prompt_hours=True
+        ),)),
+    )),
+    Rule("exercise", _any("exercise", "workout", "gym", "run", "jog", "fitness"), (
+        Variant((), (EventSpec("Exercise", 7, 0, 60, "Gym", "Physical activity"),)),
+    )),
+    Rule("shower", _any("shower", "bath", "wash"), (
+        Variant((), (EventSpec("Shower", 7, 30, 20, "Bathroom", "Personal hygiene"),)),
+    )),
+    Rule("work", _any("work", "job", "office", "meeting"), (
+        Variant((), (EventSpec("Work", 9, 0, 480, "Office", "Work time", use_prompt_time=True),)),
+    )),
+)
+
+STOP_WORDS = frozenset({"i", "want", "to", "in", "the", "and", "a", "an", "at", "on", "for", "with"})
+
+_TIME_RE = re.compile(r'(\d{1,2}):?(\d{2})?\s*(am|pm)?')
+_HOURS_RE = re.compile(r'(\d+)\s*hour')
+
+
+def _collect_keywords(rules) -> Tuple[str, ...]:
+    keywords = []
+    for rule in rules:
+        for group in rule.triggers:
+            keywords.extend(group)
+        for variant in rule.variants:
+            keywords.extend(variant.when)
+    return tuple(dict.fromkeys(keywords))
+
+
+def _template(spec: EventSpec) -> Optional[dict]:
+    """EventItem fields of a spec whose times do not depend on the prompt"""
+    if spec.use_prompt_time or spec.use_prompt_hours:
+        return None
+    end_hour = spec.hour + (spec.minute + spec.duration) // 60
+    end_min = (spec.minute + spec.duration) % 60
+    return {
+        "title": spec.title,
+        "start_time": f"{spec.hour:02d}:{spec.minute:02d}",
+        "end_time": f"{end_hour:02d}:{end_min:02d}",
+        "location": spec.location,
+        "description": spec.description or spec.title,
+    }
+
+
+class _CompiledRule(NamedTuple):
+    all_of: Tuple[FrozenSet[str], ...]  # multi-keyword triggers
+    variants: Tuple[Tuple[FrozenSet[str], Tuple[Tuple[EventSpec, Optional[dict]], ...]], ...]
+
+
+def _compile_rules(rules) -> Tuple[Tuple[_CompiledRule, ...], Dict[str, FrozenSet[int]]]:
+    """Rules with precomputed event templates, plus, per keyword, the
+    indexes of the rules it fires on its own."""
+    compiled = tuple(
+        _CompiledRule(
+            all_of=tuple(frozenset(g) for g in rule.triggers if len(g) > 1),
+            variants=tuple(
+                (frozenset(v.when), tuple((spec, _template(spec)) for spec in v.events))
+                for v in rule.variants
+            ),
+        )
+        for rule in rules
+    )
+    fires = {
+        keyword: frozenset(i for i, rule in enumerate(rules) if (keyword,) in rule.triggers)
+        for keyword in _collect_keywords(rules)
+    }
+    return compiled, fires
+
+
+_COMPILED_RULES, _KEYWORD_FIRES = _compile_rules(RULES)
+_KEYWORDS = tuple(_KEYWORD_FIRES)
+_MULTI_KEYWORD_RULES = tuple(i for i, rule in enumerate(_COMPILED_RULES) if rule.all_of)
+
+
+def matched_keywords(prompt_lower: str) -> Tuple[Set[str], Set[int]]:
+    """Every rule keyword occurring anywhere in the prompt, each looked up
+    once, and the indexes of the rules they fire"""
+    found = {k for k in _KEYWORDS if k in prompt_lower}
+    fired: Set[int] = set()
+    for keyword in found:
+        fired.update(_KEYWORD_FIRES[keyword])
+    for i in _MULTI_KEYWORD_RULES:
+        if any(group <= found for group in _COMPILED_RULES[i].all_of):
+            fired.add(i)
+    return found, fired
+
+
+def _first_prompt_time(prompt_lower: str) -> Optional[Tuple[int, int]]:
+    match = _TIME_RE.search(prompt_lower)
+    if not match:
+        return None
+    hour = int(match.group(1))
+    minute = int(match.group(2)) if match.group(2) else 0
+    if match.group(3) == 'pm' and hour < 12:
+        hour += 12
+    elif match.group(3) == 'am' and hour == 12:
+        hour = 0
+    return hour, minute
+
+
+def _make_event(title, start_hour, start_min, duration_min, location, desc, date) -> EventItem:
+    end_hour = start_hour + (start_min + duration_min) // 60
+    end_min = (start_min + duration_min) % 60
+    return EventItem(
+        title=title,
+        date=date,
+        start_time=f"{start_hour:02d}:{start_min:02d}",
+        end_time=f"{end_hour:02d}:{end_min:02d}",
+        location=location,
+        description=desc or title,
+    )
+
+
+def create_fallback_events(prompt: str, today: datetime) -> ScheduleResponse:
+    """
+    Smart fallback that understands natural language and creates structured events.
+    Works without any AI APIs - uses pattern matching and intelligent parsing.
+    """
+    prompt_lower = prompt.lower()
+    date = today.date().isoformat()  # YYYY-MM-DD, cheaper than strftime
+    found, fired = matched_keywords(prompt_lower)
+    events: List[EventItem] = []
+    prompt_time = False  # not looked up yet
+
+    for i in sorted(fired):
+        for when, specs in _COMPILED_RULES[i].variants:
+            if not when or not found.isdisjoint(when):
+                break
+        for spec, template in specs:
+            if template is not None:
+                events.append(EventItem(date=date, **template))
+                continue
+            hour, minute, duration = spec.hour, spec.minute, spec.duration
+            if spec.use_prompt_hours:
+                hours = _HOURS_RE.search(prompt_lower)
+                if hours:
+                    duration = int(hours.group(1)) * 60
+            if spec.use_prompt_time:
+                if prompt_time is False:
+                    prompt_time = _first_prompt_time(prompt_lower)
+                if prompt_time is not None:
+                    hour, minute = prompt_time
+            events.append(_make_event(
+                spec.title, hour, minute, duration, spec.location, spec.description, date
+            ))
+
+    # If no specific patterns matched, create intelligent events from keywords
+    if not events:
+        meaningful_words = [w for w in prompt_lower.split() if w not in STOP_WORDS and len(w) > 2]
+        if meaningful_words:
+            title = " ".join(meaningful_words[:4]).title()
+        else:
+            # Last resort
+            title = prompt[:50] if len(prompt) > 50 else prompt
+        events.append(_make_event(title, 12, 0, 60, "", prompt, date))
+
+    # Sort events by time
+    events.sort(key=lambda e: (e.date, e.start_time))
+
+    return ScheduleResponse(
+        events=events,
+        summary=f"✅ Created {len(events)} event(s) using smart fallback mode (no AI needed)",
+        source="fallback",
+    )
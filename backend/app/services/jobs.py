@@ -0,0 +1,172 @@
+"""
+Background jobs for schedule generation.
+
+A job is accepted at once and run by a small pool of worker tasks, so the
+client does not have to hold a connection open while a slow model works.
+Finished jobs are kept for polling until there are more than
+``max_retained`` of them or they are older than ``retention_seconds``.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from app.services.admission import QueueFullError
+from app.services.llm_router import LatencyTracker
+from app.utils import config
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    """One schedule-generation request and, once finished, its outcome"""
+
+    def __init__(
+        self,
+        prompt: str,
+        user_id: Optional[str] = None,
+        deadline_ms: Optional[int] = None,
+        auto_insert: bool = False,
+        queue_user: str = "",
+    ) -> None:
+        self.id = uuid4().hex
+        self.prompt = prompt
+        self.user_id = user_id
+        self.queue_user = queue_user  # key in the fair LLM queue
+        self.deadline_ms = deadline_ms
+        self.auto_insert = auto_insert
+        self.status = QUEUED
+        self.created_at = _now_iso()
+        self.finished_at: Optional[str] = None
+        self.result = None  # ScheduleResponse
+        self.error: Optional[str] = None
+        self.event_ids: List[str] = []
+        self.done = asyncio.Event()
+        self._finished_mono: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result.model_dump() if self.result is not None else None,
+            "error": self.error,
+            "event_ids": self.event_ids,
+        }
+
+
+class JobManager:
+    """Bounded job queue drained by ``workers`` tasks running ``handler``.
+
+    ``handler(job)`` fills in job.result (and anything else it needs to);
+    an exception marks the job failed. Workers are started from the app
+    lifespan, or on the first submit if that has not happened.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Job], Awaitable[None]],
+        workers: int = config.JOBS_WORKERS,
+        max_pending: int = config.JOBS_MAX_PENDING,
+        max_retained: int = config.JOBS_MAX_RETAINED,
+        retention_seconds: float = config.JOBS_RETENTION_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_retained = max_retained
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._finished: deque = deque()  # ids in finishing order
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.run_times = LatencyTracker()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        for job in self._jobs.values():
+            if job.status == QUEUED:
+                self._queue.put_nowait(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def submit(self, job: Job) -> Job:
+        """Queue a job; QueueFullError when ``max_pending`` jobs are waiting"""
+        if not self._tasks:
+            self.start()
+        if self._queue.qsize() >= self.max_pending:
+            per_job = self.run_times.p50 or config.LLM_HEDGE_DELAY
+            raise QueueFullError(max(1, math.ceil(self._queue.qsize() * per_job / self.workers)))
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job)
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            started = self.clock()
+            try:
+                await self.handler(job)
+                job.status = DONE
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Server shutting down"
+                raise
+            except Exception as e:
+                print(f"Job {job.id} failed: {e!r}")
+                job.status = FAILED
+                job.error = str(e)
+            finally:
+                self.run_times.record(self.clock() - started)
+                job.finished_at = _now_iso()
+                job._finished_mono = self.clock()
+                self._finished.append(job.id)
+                job.done.set()
+                self._prune()
+
+    def _prune(self) -> None:
+        cutoff = self.clock() - self.retention_seconds
+        while self._finished:
+            job = self._jobs.get(self._finished[0])
+            if job is not None and len(self._finished) <= self.max_retained and job._finished_mono > cutoff:
+                break
+            self._finished.popleft()
+            if job is not None:
+                del self._jobs[job.id]
+
+    def stats(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.workers, "max_pending": self.max_pending, **counts}
@@ -0,0 +1,265 @@
+"""
+Routes LLM completions across providers (Ollama, OpenAI, Gemini).
+
+Providers are tried fastest first, by their recent median latency. When the
+current provider has not answered within its own p95, the next one is
+started as a hedge and whichever gives a usable answer first wins; the
+others are cancelled. Each provider has its own circuit breaker, and a
+failure moves on to the next provider straight away.
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, TypeVar
+
+from app.services.ollama_service import CircuitBreaker
+from app.utils import config
+
+T = TypeVar("T")
+
+
+class Provider(ABC):
+    """One LLM backend.
+
+    complete() returns the model's text, or None when there is no usable
+    answer; raising counts as a failure as well. ``system`` is a fixed
+    instruction prefix and ``max_tokens`` a reply budget, both optional.
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    async def complete(
+        self, prompt: str, system: Optional[str] = None, max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        ...
+
+
+class CallableProvider(Provider):
+    """Provider backed by an async function (e.g. a local stub) called as
+    ``fn(prompt, system=..., max_tokens=...)``"""
+
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Optional[str]]]) -> None:
+        self.name = name
+        self.fn = fn
+
+    async def complete(
+        self, prompt: str, system: Optional[str] = None, max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        return await self.fn(prompt, system=system, max_tokens=max_tokens)
+
+
+class OpenAIProvider(Provider):
+    """Chat completion through an ``openai.AsyncOpenAI`` client"""
+
+    name = "openai"
+
+    def __init__(self, client, model: str = config.OPENAI_MODEL, **options) -> None:
+        self.client = client
+        self.model = model
+        self.options = options
+
+    async def complete(
+        self, prompt: str, system: Optional[str] = None, max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            messages.insert(0, {"role": "system", "content": system})
+        options = dict(self.options)
+        if max_tokens:
+            options["max_tokens"] = max_tokens
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            **options,
+        )
+        return response.choices[0].message.content
+
+
+class GeminiProvider(Provider):
+    """Generation through a ``google.generativeai.GenerativeModel``"""
+
+    name = "gemini"
+
+    def __init__(self, model) -> None:
+        self.model = model
+
+    async def complete(
+        self, prompt: str, system: Optional[str] = None, max_tokens: Optional[int] = None
+    ) -> Optional[str]:
+        response = await self.model.generate_content_async(
+            f"{system}\n\n{prompt}" if system else prompt,
+            generation_config={"max_output_tokens": max_tokens} if max_tokens else None,
+        )
+        return response.text
+
+
+class LatencyTracker:
+    """Latencies of the last ``window`` successful calls of one provider"""
+
+    def __init__(self, window: int = config.LLM_LATENCY_WINDOW) -> None:
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.quantile(0.95)
+
+
+class RouteResult(NamedTuple):
+    provider: str  # name of the provider that answered
+    value: Any  # what ``parse`` returned for its answer
+
+
+class LLMRouter:
+    """Hedged, latency-aware routing over a list of providers.
+
+    Until a provider has ``min_samples`` measured calls, ``hedge_delay``
+    stands in for both its p50 (when ranking) and its p95 (when hedging):
+    it is tried before providers measured slower than that, and after
+    faster ones. A provider that only ever loses hedge races is therefore
+    not put first again on every request.
+    """
+
+    def __init__(
+        self,
+        providers: Iterable[Provider],
+        hedge: bool = config.LLM_HEDGE,
+        hedge_delay: float = config.LLM_HEDGE_DELAY,
+        min_samples: int = config.LLM_HEDGE_MIN_SAMPLES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.providers: List[Provider] = list(providers)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_samples = max(1, min_samples)
+        self.clock = clock
+        self.latency: Dict[str, LatencyTracker] = {p.name: LatencyTracker() for p in self.providers}
+        self.breakers: Dict[str, CircuitBreaker] = {p.name: CircuitBreaker(clock=clock) for p in self.providers}
+        self.wins: Dict[str, int] = {p.name: 0 for p in self.providers}
+        self.hedges = 0
+
+    def _measured(self, provider: Provider) -> bool:
+        return len(self.latency[provider.name].samples) >= self.min_samples
+
+    def ranked(self) -> List[Provider]:
+        """Providers in the order they will be tried, fastest first"""
+        return sorted(
+            self.providers,
+            key=lambda p: self.latency[p.name].p50 if self._measured(p) else self.hedge_delay,
+        )
+
+    def _hedge_after(self, provider: Provider) -> float:
+        if self._measured(provider):
+            return self.latency[provider.name].p95
+        return self.hedge_delay
+
+    async def _call(
+        self, provider: Provider, prompt: str, parse: Callable[[str], Optional[T]], **kwargs
+    ) -> Optional[T]:
+        breaker = self.breakers[provider.name]
+        started = self.clock()
+        try:
+            text = await provider.complete(prompt, **kwargs)
+            value = parse(text) if text else None
+        except asyncio.CancelledError:
+            # lost a hedge race: says nothing about its health, and the time
+            # it had taken so far is not a latency, so nothing is recorded
+            raise
+        except Exception as e:
+            print(f"LLM provider {provider.name} failed: {e!r}")
+            value = None
+        if value is None:
+            breaker.record_failure()
+            return None
+        breaker.record_success()
+        self.latency[provider.name].record(self.clock() - started)
+        return value
+
+    async def complete(
+        self,
+        prompt: str,
+        parse: Callable[[str], Optional[T]] = lambda text: text,
+        system: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Optional[RouteResult]:
+        """First usable answer from any provider, or None if all of them fail.
+
+        ``parse`` turns the raw text into the result; an answer it maps to
+        None is treated as a failure, so an unusable reply never wins a race.
+        ``system`` and ``max_tokens`` are passed on to every provider.
+        """
+        queue = iter(self.ranked())
+        running: Dict[asyncio.Future, Provider] = {}
+        last: Optional[Provider] = None
+
+        def launch() -> bool:
+            nonlocal last
+            for provider in queue:
+                if self.breakers[provider.name].allow():
+                    running[asyncio.ensure_future(self._call(
+                        provider, prompt, parse, system=system, max_tokens=max_tokens
+                    ))] = provider
+                    last = provider
+                    return True
+            return False
+
+        exhausted = not launch()
+        try:
+            while running:
+                timeout = self._hedge_after(last) if self.hedge and not exhausted else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # the latest provider is slower than its p95: hedge
+                    exhausted = not launch()
+                    if not exhausted:
+                        self.hedges += 1
+                    continue
+                for task in done:
+                    provider = running.pop(task)
+                    value = task.result()
+                    if value is not None:
+                        self.wins[provider.name] += 1
+                        return RouteResult(provider.name, value)
+                if not running:
+                    exhausted = not launch()
+        finally:
+            for task in running:
+                task.cancel()
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "hedges": self.hedges,
+            "providers": [
+                {
+                    "name": p.name,
+                    "samples": len(self.latency[p.name].samples),
+                    "p50_ms": _ms(self.latency[p.name].p50),
+                    "p95_ms": _ms(self.latency[p.name].p95),
+                    "circuit_open": self.breakers[p.name].is_open,
+                    "wins": self.wins[p.name],
+                }
+                for p in self.ranked()
+            ],
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[int]:
+    return None if seconds is None else round(seconds * 1000)
@@ -0,0 +1,259 @@
+import asyncio
+import time
+import json
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from app.utils import config
+
+
+class OllamaClient:
+    """Async Ollama client sharing one keep-alive connection pool.
+
+    The underlying httpx.AsyncClient is created on first use so importing
+    this module never touches the network or an event loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str = config.OLLAMA_BASE_URL,
+        connect_timeout: float = config.OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = config.OLLAMA_READ_TIMEOUT,
+        max_connections: int = config.OLLAMA_MAX_CONNECTIONS,
+        max_keepalive: int = config.OLLAMA_MAX_KEEPALIVE,
+        keep_alive: str = config.OLLAMA_KEEP_ALIVE,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+        )
+        self.keep_alive = keep_alive
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=self._transport,
+            )
+        return self._client
+
+    def _body(self, model: str, prompt: str, stream: bool, options, system, format) -> dict:
+        body = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options or {},
+            "keep_alive": self.keep_alive,
+        }
+        # A fixed system prompt is a prompt prefix the loaded model can reuse
+        # across requests; keep_alive keeps it (and that cache) in memory.
+        if system:
+            body["system"] = system
+        # JSON schema (or "json") the output is constrained to
+        if format:
+            body["format"] = format
+        return body
+
+    async def generate(
+        self, model: str, prompt: str, options: dict = None, system: str = None, format=None
+    ) -> httpx.Response:
+        """POST /api/generate without streaming; connection errors propagate"""
+        return await self.client.post(
+            "/api/generate",
+            json=self._body(model, prompt, False, options, system, format),
+        )
+
+    async def generate_stream(
+        self, model: str, prompt: str, options: dict = None, system: str = None, format=None
+    ) -> AsyncIterator[str]:
+        """POST /api/generate with streaming; yields response text fragments.
+
+        Raises httpx.HTTPStatusError for a non-200 status before yielding.
+        """
+        async with self.client.stream(
+            "POST",
+            "/api/generate",
+            json=self._body(model, prompt, True, options, system, format),
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+
+    async def embeddings(self, model: str, prompt: str) -> List[float]:
+        """Embedding vector from POST /api/embeddings"""
+        response = await self.client.post(
+            "/api/embeddings",
+            json={"model": model, "prompt": prompt, "keep_alive": self.keep_alive},
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+    async def list_models(self) -> List[str]:
+        """Names of installed models from GET /api/tags"""
+        response = await self.client.get("/api/tags")
+        response.raise_for_status()
+        return [m["name"] for m in response.json().get("models", []) if m.get("name")]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker.
+
+    Opens after ``threshold`` failures in a row. Once ``cooldown`` seconds
+    have passed, allow() lets a single trial call through (re-arming the
+    timer for everyone else); its success closes the breaker again.
+    """
+
+    def __init__(
+        self,
+        threshold: int = config.OLLAMA_BREAKER_THRESHOLD,
+        cooldown: float = config.OLLAMA_BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.clock() - self.opened_at >= self.cooldown:
+            self.opened_at = self.clock()  # half-open: one trial per cooldown
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = self.clock()
+
+
+def _base_name(model: str) -> str:
+    return model.split(":", 1)[0]
+
+
+# name fragments of embedding-only models (nomic-embed-text, all-minilm,
+# bge-m3, ...), which cannot generate text
+_EMBEDDING_MARKERS = ("embed", "minilm", "bge-")
+
+
+def _is_embedding_model(model: str) -> bool:
+    name = _base_name(model).lower()
+    return (
+        name == _base_name(config.SEMANTIC_CACHE_EMBED_MODEL).lower()
+        or any(marker in name for marker in _EMBEDDING_MARKERS)
+    )
+
+
+class ModelRegistry:
+    """Cached view of installed Ollama models plus per-model health.
+
+    The installed list comes from /api/tags and is refreshed on startup and
+    then every ``refresh_interval`` seconds in the background. Until the
+    first successful refresh the preference list is used as-is. A separate
+    server breaker trips on connection errors so requests fail fast while
+    Ollama is down.
+    """
+
+    def __init__(
+        self,
+        client: OllamaClient,
+        preferred: List[str] = config.OLLAMA_MODELS,
+        refresh_interval: float = config.OLLAMA_MODEL_REFRESH_SECONDS,
+    ) -> None:
+        self.client = client
+        self.preferred = list(preferred)
+        self.refresh_interval = refresh_interval
+        self.installed: Optional[List[str]] = None
+        self.server_breaker = CircuitBreaker(threshold=1)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self._breakers:
+            self._breakers[model] = CircuitBreaker()
+        return self._breakers[model]
+
+    def candidates(self) -> List[str]:
+        """Models to try, best first: installed preferred ones, then other
+        installed ones, leaving out embedding models"""
+        if self.installed is None:
+            return list(self.preferred)
+        ordered = []
+        for name in self.preferred:
+            ordered.extend(m for m in self.installed if _base_name(m) == name or m == name)
+        ordered.extend(
+            m for m in self.installed if m not in ordered and not _is_embedding_model(m)
+        )
+        return ordered
+
+    def mark_missing(self, model: str) -> None:
+        """Drop a model Ollama reported as not found until the next refresh"""
+        if self.installed is not None and model in self.installed:
+            self.installed = [m for m in self.installed if m != model]
+
+    async def refresh(self) -> None:
+        try:
+            installed = await self.client.list_models()
+            self.server_breaker.record_success()
+            if installed != self.installed:
+                print(f"Ollama models available: {installed}")
+            self.installed = installed
+        except (httpx.HTTPError, ValueError) as e:
+            self.server_breaker.record_failure()
+            print(f"Could not list Ollama models: {e!r}")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Shared client and model registry for the whole app; started and closed
+# from the lifespan in app.main
+ollama_client = OllamaClient()
+model_registry = ModelRegistry(ollama_client)
@@ -1,10 +1,13 @@
+import json
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.database.ai_schema import AIResponse
+from app.services.llm_router import OpenAIProvider
 from app.utils.config import OPENAI_KEY
 class AIService:
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_KEY)
+        # async client: the completion no longer ties up the event loop or a worker thread
+        self.provider = OpenAIProvider(AsyncOpenAI(api_key=OPENAI_KEY), model="gpt-4.1")
 
 
     async def generate_event_from_text(self, text: str) -> AIResponse:
@@ -21,12 +24,10 @@ class AIService:
         - description
         """
 
-        response = self.client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[{"role": "user", "content": prompt}]
-        )
+        event_json = await self.provider.complete(prompt)
+        if not event_json:
+            raise ValueError("OpenAI returned an empty response")
+        event_dict = json.loads(event_json.strip())
 
-        event_json = response.choices[0].message.content.strip()
-        event_dict = eval(event_json)   # or use json.loads()
-
-        return AIResponse(**event_dict)
+        # the model may send its own "source"; ours wins
+        return AIResponse(**{**event_dict, "source": "openai"})
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from app.database.schemas import ScheduleResponse
+from app.utils import config
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+def schedule_cache_key(prompt: str, today: datetime) -> Tuple[str, str]:
+    """Normalized prompt plus the date context _build_ai_prompt injects"""
+    return normalize_prompt(prompt), today.strftime("%Y-%m-%d %A")
+
+
+class ScheduleCache:
+    """LRU + TTL cache of parsed ScheduleResponse objects.
+
+    Entries expire after ``ttl`` seconds or at the next local midnight,
+    whichever comes first, since the cached events are dated "today".
+    The total size (serialized JSON bytes) is capped at ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        ttl: float = config.SCHEDULE_CACHE_TTL_SECONDS,
+        max_bytes: int = config.SCHEDULE_CACHE_MAX_BYTES,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        # key -> (expires_at, size, response)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, ScheduleResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, prompt: str, today: datetime) -> Optional[ScheduleResponse]:
+        key = schedule_cache_key(prompt, today)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                self._evict(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, prompt: str, today: datetime, response: ScheduleResponse) -> None:
+        key = schedule_cache_key(prompt, today)
+        size = len(response.model_dump_json())
+        if size > self.max_bytes:
+            return
+        midnight = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        expires_at = min(self.clock() + self.ttl, midnight.timestamp())
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (expires_at, size, response)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, key) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+schedule_cache = ScheduleCache()
@@ -0,0 +1,318 @@
+"""
+Semantic cache of schedule results.
+
+Prompts that only differ in wording ("pray all 5 prayers" / "I want to do
+all my salah today") miss the exact-match schedule cache. This cache embeds
+each prompt and keeps the vectors, unit length, as rows of one
+preallocated NumPy matrix, so a lookup is a single matrix-vector product:
+the best row at or above ``threshold`` cosine similarity is a hit. Cached
+events are moved to today's date before they are returned.
+
+Three guards keep near-duplicates from answering for each other:
+  * prompts must mention the same times ("study 8-10" is not "study 9-11")
+  * prompts must be about the same things: they have to fire the same
+    fallback rules (so "pray" and "salah" agree) and use the same other
+    content words ("study math" is not "study physics")
+  * prompts that name a weekday or a date ("friday", "2024-05-01") only
+    match entries stored on the same day; relative ones ("tomorrow") keep
+    their meaning when the events are moved
+
+Without NumPy the cache is disabled and every lookup is a miss.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from app.database.schemas import ScheduleResponse
+from app.services.fallback_service import matched_keywords
+from app.services.ollama_service import CircuitBreaker, ollama_client
+from app.services.schedule_cache import normalize_prompt
+from app.utils import config
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+_WORD_RE = re.compile(r"\w+")
+# clock times, ranges and durations; other numbers ("all 5 prayers") may differ
+_TIME_RE = re.compile(
+    r"\d{1,2}(?::\d{2})?\s*(?:am|pm|a\.m|p\.m)|\d{1,2}:\d{2}|\d+\s*-\s*\d+|"
+    r"(?:at|from|to|until|till)\s+\d{1,2}\b|\d+\s*(?:h|hrs?|hours?|mins?|minutes?)\b"
+)
+# words whose date depends on the weekday or calendar, not just on "today"
+_DATED_RE = re.compile(
+    r"\b(?:(?:mon|tues|wednes|thurs|fri|satur|sun)day|mon|tue|wed|thu|fri|sat|sun|weekend)s?\b|"
+    r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d|"
+    r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}"
+)
+
+# words that do not change what a schedule is about
+_STOP_WORDS = frozenset("""
+    a about after also am an and are at be before but by can could day do for
+    from get go going have i if in into is it just like me my need of on or
+    our please plan put schedule should so some that the then there this to
+    today tomorrow up want we will with would you
+""".split())
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-features embedder, no model needed.
+
+    Words and the character trigrams of each word are hashed into ``dim``
+    signed buckets. Good enough to catch re-orderings and small spelling
+    changes; for real paraphrases use the Ollama embedder.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def _features(self, text: str):
+        for word in _WORD_RE.findall(text.lower()):
+            yield word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+
+    def embed_sync(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += weight if digest[4] & 1 else -weight
+        return vector
+
+    async def embed(self, text: str):
+        return self.embed_sync(text)
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's /api/embeddings; None while Ollama is unavailable"""
+
+    name = "ollama"
+
+    def __init__(
+        self,
+        client=ollama_client,
+        model: str = config.SEMANTIC_CACHE_EMBED_MODEL,
+        timeout: float = config.SEMANTIC_CACHE_EMBED_TIMEOUT,
+    ) -> None:
+        self.client = client
+        self.model = model
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+
+    async def embed(self, text: str):
+        if not self.breaker.allow():
+            return None
+        try:
+            values = await asyncio.wait_for(self.client.embeddings(self.model, text), self.timeout)
+        except Exception as e:
+            print(f"Embedding with {self.model} failed: {e!r}")
+            self.breaker.record_failure()
+            return None
+        self.breaker.record_success()
+        return np.asarray(values, dtype=np.float32)
+
+
+class _Entry:
+    __slots__ = ("response", "day", "times", "dated", "topics")
+
+    def __init__(
+        self, response: ScheduleResponse, day, times: Tuple[str, ...], dated: bool, topics
+    ) -> None:
+        self.response = response
+        self.day = day  # the "today" the events were generated for
+        self.times = times
+        self.dated = dated
+        self.topics = topics
+
+
+def _prompt_traits(normalized: str):
+    """(times, dated, topics) of a normalized prompt; prompts may only share
+    a cache entry if all three agree (dated ones also on the day)"""
+    times = {"".join(m.split()) for m in _TIME_RE.findall(normalized)}
+    keywords, fired = matched_keywords(normalized)
+    # words a rule keyword already accounts for are compared through the rules
+    words = {
+        word for word in _WORD_RE.findall(normalized)
+        if word not in _STOP_WORDS and not word.isdigit()
+        and not any(keyword in word for keyword in keywords)
+    }
+    topics = (frozenset(fired), frozenset(words))
+    return tuple(sorted(times)), bool(_DATED_RE.search(normalized)), topics
+
+
+def _shift_date(value: str, shift: timedelta) -> str:
+    try:
+        return (datetime.strptime(value, "%Y-%m-%d") + shift).strftime("%Y-%m-%d")
+    except ValueError:
+        return value
+
+
+def redate(response: ScheduleResponse, from_day, to_day) -> ScheduleResponse:
+    """Copy of ``response`` with every event moved from ``from_day``'s
+    context to ``to_day``'s ("tomorrow" stays the day after)"""
+    shift = to_day - from_day
+    if not shift:
+        return response.model_copy()
+    events = [
+        event.model_copy(update={"date": _shift_date(event.date, shift)})
+        for event in response.events
+    ]
+    return response.model_copy(update={"events": events})
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of ScheduleResponse objects by prompt embedding.
+
+    Holds at most ``capacity`` entries; when full, the least recently used
+    one is replaced. Entries expire after ``ttl`` seconds. The matrix is
+    allocated on the first put, once the embedder's dimension is known.
+    """
+
+    def __init__(
+        self,
+        embedder=None,
+        capacity: int = config.SEMANTIC_CACHE_CAPACITY,
+        threshold: float = config.SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = config.SEMANTIC_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+        enabled: bool = True,
+    ) -> None:
+        self.embedder = embedder
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.clock = clock
+        self.enabled = enabled and NUMPY_AVAILABLE and embedder is not None
+        self.hits = 0
+        self.misses = 0
+        self.embed_failures = 0
+        self._matrix = None  # capacity x dim, unit rows
+        self._expires = None  # per row; 0 marks a free row
+        self._last_used = None
+        self._entries = [None] * self.capacity
+        self._tick = 0
+        # recently embedded prompts, so get() then put() embeds only once
+        self._vectors: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def _embed(self, normalized: str):
+        with self._lock:
+            vector = self._vectors.get(normalized)
+            if vector is not None:
+                self._vectors.move_to_end(normalized)
+                return vector
+        vector = await self.embedder.embed(normalized)
+        if vector is None:
+            self.embed_failures += 1
+            return None
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return None
+        vector = vector / norm
+        with self._lock:
+            self._vectors[normalized] = vector
+            while len(self._vectors) > 256:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _allocate(self, dim: int) -> None:
+        self._matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+        self._expires = np.zeros(self.capacity, dtype=np.float64)
+        self._last_used = np.zeros(self.capacity, dtype=np.int64)
+        self._entries = [None] * self.capacity
+
+    async def get(self, prompt: str, today: datetime) -> Optional[ScheduleResponse]:
+        """A cached response for a similar prompt, moved to ``today``, or None"""
+        if not self.enabled:
+            return None
+        if self._matrix is None:
+            self.misses += 1
+            return None
+        normalized = normalize_prompt(prompt)
+        vector = await self._embed(normalized)
+        times, dated, topics = _prompt_traits(normalized)
+        with self._lock:
+            if vector is None or self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._matrix @ vector
+            scores[self._expires <= self.clock()] = -1.0
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for row in candidates[np.argsort(-scores[candidates])]:
+                entry = self._entries[row]
+                if entry.times != times or entry.topics != topics:
+                    continue
+                if (dated or entry.dated) and entry.day != today.date():
+                    continue
+                self._tick += 1
+                self._last_used[row] = self._tick
+                self.hits += 1
+                break
+            else:
+                self.misses += 1
+                return None
+        return redate(entry.response, entry.day, today.date())
+
+    async def put(self, prompt: str, today: datetime, response: ScheduleResponse) -> None:
+        if not self.enabled:
+            return
+        normalized = normalize_prompt(prompt)
+        vector = await self._embed(normalized)
+        if vector is None:
+            return
+        times, dated, topics = _prompt_traits(normalized)
+        with self._lock:
+            if self._matrix is None or vector.shape[0] != self._matrix.shape[1]:
+                self._allocate(vector.shape[0])  # new embedding model: start over
+            now = self.clock()
+            # same prompt again: overwrite its row
+            scores = self._matrix @ vector
+            row = int(np.argmax(scores))
+            if not (scores[row] >= 0.9999 and self._entries[row] is not None
+                    and self._entries[row].times == times
+                    and self._entries[row].topics == topics):
+                free = np.flatnonzero(self._expires <= now)
+                row = int(free[0]) if free.size else int(np.argmin(self._last_used))
+            self._matrix[row] = vector
+            self._expires[row] = now + self.ttl
+            self._tick += 1
+            self._last_used[row] = self._tick
+            self._entries[row] = _Entry(response, today.date(), times, dated, topics)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live = 0 if self._matrix is None else int(np.count_nonzero(self._expires > self.clock()))
+            return {
+                "enabled": self.enabled,
+                "embedder": getattr(self.embedder, "name", None),
+                "entries": live,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "embed_failures": self.embed_failures,
+            }
+
+
+def _default_embedder():
+    if config.SEMANTIC_CACHE_EMBEDDER == "hashing":
+        return HashingEmbedder()
+    return OllamaEmbedder()
+
+
+semantic_cache = SemanticCache(
+    _default_embedder() if NUMPY_AVAILABLE else None,
+    enabled=config.SEMANTIC_CACHE_ENABLED,
+)
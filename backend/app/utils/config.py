@@ -4,3 +4,80 @@ import os
 load_dotenv()  # This loads the .env file automatically
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+
+# Storage backend: "memory" (process-local, default) or "sql" (SQLAlchemy).
+# For local testing against SQLite use e.g. DATABASE_URL=sqlite:///./calendar.db
+DB_BACKEND = os.getenv("DB_BACKEND", "memory").lower()
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./calendar.db")
+# The memory backend logs every write to DB_DATA_DIR and reloads it on
+# startup; set DB_DATA_DIR="" to keep everything in process memory only
+DB_DATA_DIR = os.getenv("DB_DATA_DIR", "./data")
+DB_WAL_FSYNC = os.getenv("DB_WAL_FSYNC", "true").lower() in ("1", "true", "yes")
+DB_SNAPSHOT_WAL_BYTES = int(os.getenv("DB_SNAPSHOT_WAL_BYTES", str(64 * 1024 * 1024)))  # log size that triggers a snapshot
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+
+# Local LLM (Ollama) HTTP client
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "2"))  # seconds
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "90"))  # seconds
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "256"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "64"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # how long the model stays loaded
+# Reply token budget (num_predict): base + per expected event, capped
+OLLAMA_PREDICT_BASE = int(os.getenv("OLLAMA_PREDICT_BASE", "32"))
+OLLAMA_PREDICT_PER_EVENT = int(os.getenv("OLLAMA_PREDICT_PER_EVENT", "96"))
+OLLAMA_PREDICT_MIN_EVENTS = int(os.getenv("OLLAMA_PREDICT_MIN_EVENTS", "4"))
+OLLAMA_MAX_PREDICT = int(os.getenv("OLLAMA_MAX_PREDICT", "2000"))
+# Preferred models, best first; only installed ones (per /api/tags) are tried
+OLLAMA_MODELS = [
+    m.strip()
+    for m in os.getenv("OLLAMA_MODELS", "llama3.2,llama3,mistral,codellama,llama2").split(",")
+    if m.strip()
+]
+OLLAMA_MODEL_REFRESH_SECONDS = float(os.getenv("OLLAMA_MODEL_REFRESH_SECONDS", "60"))
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "2"))  # consecutive failures
+OLLAMA_BREAKER_COOLDOWN = float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))  # seconds
+
+# Exact-match cache of /chat/generate results
+SCHEDULE_CACHE_TTL_SECONDS = float(os.getenv("SCHEDULE_CACHE_TTL_SECONDS", "3600"))
+SCHEDULE_CACHE_MAX_BYTES = int(os.getenv("SCHEDULE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Serialized GET /events/{user_id} listings and rendered calendar.ics feeds
+LISTING_CACHE_MAX_BYTES = int(os.getenv("LISTING_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+FEED_CACHE_MAX_BYTES = int(os.getenv("FEED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# POST /chat/generate/batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # generations in flight per batch
+
+# LLM provider router: providers are hedged after their p95 latency
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+LLM_HEDGE = os.getenv("LLM_HEDGE", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "5"))  # seconds, until a p95 is measured
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "5"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "100"))  # calls per provider
+
+# Admission control in front of LLM generations
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))  # generations running at once
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))  # waiting beyond that, then 429
+LLM_BATCH_QUEUE_SIZE = int(os.getenv("LLM_BATCH_QUEUE_SIZE", "16"))  # places batch work may take
+
+# Background schedule-generation jobs (/chat/jobs)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_PENDING = int(os.getenv("JOBS_MAX_PENDING", "100"))  # queued jobs, then 429
+JOBS_MAX_RETAINED = int(os.getenv("JOBS_MAX_RETAINED", "1000"))  # finished jobs kept
+JOBS_RETENTION_SECONDS = float(os.getenv("JOBS_RETENTION_SECONDS", "3600"))
+JOBS_SSE_KEEPALIVE_SECONDS = float(os.getenv("JOBS_SSE_KEEPALIVE_SECONDS", "15"))
+
+# Semantic cache: reuse a result for a differently worded, similar prompt
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "ollama")  # "ollama" or "hashing"
+SEMANTIC_CACHE_EMBED_MODEL = os.getenv("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_EMBED_TIMEOUT = float(os.getenv("SEMANTIC_CACHE_EMBED_TIMEOUT", "2"))  # seconds
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "4096"))  # entries
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
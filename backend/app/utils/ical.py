@@ -0,0 +1,555 @@
+"""
+Minimal single-pass VEVENT parser.
+
+Events are parsed once when they are written and stored as EventRecord
+instances, so reads never have to look at the iCalendar text again.
+
+The text around the VEVENT (VTIMEZONE blocks, a VCALENDAR wrapper) is
+nearly always the same from one event to the next; the VTIMEZONE blocks
+are kept once in a shared table and each record only references them.
+"""
+
+import calendar
+import codecs
+import hashlib
+import re
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover - Python < 3.9
+    ZoneInfo = None
+
+_DURATION_RE = re.compile(
+    r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+_VEVENT_RE = re.compile(r"^BEGIN:VEVENT\b.*?^END:VEVENT[^\S\r\n]*(?:\r?\n)?", re.I | re.M | re.S)
+_ESCAPE_RE = re.compile(r"\\([\\;,nN])")
+_LINE_END_RE = re.compile(r"\r\n|\r|\n")
+_VTIMEZONE_RE = re.compile(r"^BEGIN:VTIMEZONE\b.*?^END:VTIMEZONE[^\S\r\n]*(?:\r?\n)?", re.I | re.M | re.S)
+
+
+class _SharedText(str):
+    # a str that can be weakly referenced, so the table does not keep it alive
+    __slots__ = ("__weakref__",)
+
+
+class ComponentTable:
+    """Content-addressed store of VTIMEZONE blocks shared between events.
+
+    intern() returns the single stored copy of ``text``, keyed by its
+    BLAKE2 digest, so identical blocks cost one string no matter how many
+    events carry them. The table only holds weak references: a block is
+    freed with the last event (or feed chunk) that uses it, so blocks from
+    deleted or replaced events do not accumulate.
+    """
+
+    def __init__(self) -> None:
+        self._texts: "weakref.WeakValueDictionary[bytes, _SharedText]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def intern(self, text: str) -> str:
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._lock:
+            stored = self._texts.get(key)
+            if stored is None:
+                stored = self._texts[key] = _SharedText(text)
+                return stored
+        if stored != text:
+            return text  # digest collision: keep a private copy
+        self.hits += 1
+        return stored
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            texts = list(self._texts.values())
+        return {
+            "entries": len(texts),
+            "bytes": sum(len(t) for t in texts),
+            "hits": self.hits,
+        }
+
+
+component_table = ComponentTable()
+
+
+def split_components(text: str) -> Union[str, Tuple[str, ...]]:
+    """``text`` as pieces whose join is ``text``, with the VTIMEZONE blocks
+    in front of the VEVENT interned in component_table; plain ``text`` if
+    there are none. Other text around the VEVENT (a VCALENDAR wrapper) is
+    whatever the client sent, so it is kept per event rather than shared."""
+    match = _VEVENT_RE.search(text)
+    if match is None:
+        return text
+    before = text[:match.start()]
+    pieces = []
+    pos = 0
+    for tz in _VTIMEZONE_RE.finditer(before):
+        if tz.start() > pos:
+            pieces.append(before[pos:tz.start()])
+        pieces.append(component_table.intern(tz.group()))
+        pos = tz.end()
+    if not pieces:
+        return text
+    pieces.append(text[pos:])
+    return tuple(pieces)
+
+
+class EventRecord:
+    """Compact, pre-parsed representation of a single VEVENT.
+
+    start/end are epoch seconds (UTC). Floating times (no Z and no TZID) are
+    interpreted as UTC so that ordering stays consistent. The original text
+    is available as ``raw`` for round-tripping; VTIMEZONE blocks in front
+    of the VEVENT are stored once in component_table and joined back on read. ``id`` is
+    the stable key the store assigns on insert (the UID when present) and
+    ``seq`` its per-user insertion sequence number, used for cursor
+    pagination.
+    """
+
+    __slots__ = ("id", "seq", "uid", "start", "end", "summary", "location", "description", "_text")
+
+    def __init__(
+        self,
+        uid: Optional[str],
+        start: Optional[int],
+        end: Optional[int],
+        summary: str,
+        location: str,
+        description: str,
+        raw: str,
+        id: Optional[str] = None,
+    ) -> None:
+        self.id = id
+        self.seq = 0
+        self.uid = uid
+        self.start = start
+        self.end = end
+        self.summary = summary
+        self.location = location
+        self.description = description
+        # only text with a component besides the VEVENT has anything to share
+        self._text = split_components(raw) if raw.count("BEGIN:") > 1 else raw
+
+    @property
+    def raw(self) -> str:
+        text = self._text
+        return text if text.__class__ is str else "".join(text)
+
+    def to_dict(self) -> Dict:
+        """Serialize for API responses and persistent storage"""
+        return {
+            "id": self.id,
+            "vevent": self.raw,
+            "uid": self.uid,
+            "start": self.start,
+            "end": self.end,
+            "summary": self.summary,
+            "location": self.location,
+            "description": self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EventRecord":
+        """Rebuild a record from to_dict() output; falls back to parsing legacy {"vevent": ...} dicts"""
+        if "start" not in data:
+            record = parse_vevent(data.get("vevent", ""))
+            record.id = data.get("id")
+            return record
+        return cls(
+            data.get("uid"),
+            data.get("start"),
+            data.get("end"),
+            data.get("summary", ""),
+            data.get("location", ""),
+            data.get("description", ""),
+            data.get("vevent", ""),
+            data.get("id"),
+        )
+
+    def __repr__(self) -> str:
+        return f"EventRecord(id={self.id!r}, uid={self.uid!r}, start={self.start!r}, summary={self.summary!r})"
+
+
+def unfold_lines(text: str):
+    """Yield logical content lines, joining RFC 5545 folded continuations"""
+    current = None
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def unescape_text(value: str) -> str:
+    """Undo RFC 5545 TEXT escaping in one pass: an escaped backslash
+    followed by an "n" stays a backslash and an "n", not a newline"""
+    if "\\" not in value:
+        return value
+    return _ESCAPE_RE.sub(_unescape_match, value)
+
+
+def _unescape_match(match: "re.Match") -> str:
+    char = match.group(1)
+    return "\n" if char in "nN" else char
+
+
+def escape_text(value: str) -> str:
+    """RFC 5545 escaping of a TEXT property value"""
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def build_vevent(
+    summary: str,
+    dtstart: str,
+    dtend: str,
+    location: str = "",
+    description: str = "",
+) -> str:
+    """VEVENT text in the shape the app writes (floating DTSTART/DTEND like
+    20250101T090000); empty LOCATION/DESCRIPTION are left out"""
+    lines = ["BEGIN:VEVENT", f"SUMMARY:{escape_text(summary)}"]
+    if description:
+        lines.append(f"DESCRIPTION:{escape_text(description)}")
+    if location:
+        lines.append(f"LOCATION:{escape_text(location)}")
+    lines += [f"DTSTART:{dtstart}", f"DTEND:{dtend}", "END:VEVENT"]
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=128)
+def _zone(tzid: str):
+    if ZoneInfo is None:
+        return None
+    try:
+        return ZoneInfo(tzid)
+    except Exception:
+        return None
+
+
+def parse_datetime(value: str, tzid: Optional[str] = None) -> Optional[int]:
+    """Convert a DATE or DATE-TIME value to epoch seconds, or None if malformed"""
+    value = value.strip()
+    try:
+        year, month, day = int(value[0:4]), int(value[4:6]), int(value[6:8])
+        hour = minute = second = 0
+        if len(value) >= 15 and value[8] == "T":
+            hour, minute, second = int(value[9:11]), int(value[11:13]), int(value[13:15])
+    except (ValueError, IndexError):
+        return None
+
+    if not value.endswith("Z") and tzid:
+        zone = _zone(tzid.strip('"'))
+        if zone is not None:
+            try:
+                return int(datetime(year, month, day, hour, minute, second, tzinfo=zone).timestamp())
+            except ValueError:
+                return None
+    try:
+        return calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0))
+    except (ValueError, OverflowError):
+        return None
+
+
+def to_epoch(value: datetime) -> int:
+    """Epoch seconds for a datetime; naive values are floating times, read as UTC"""
+    if value.tzinfo is None:
+        return calendar.timegm(value.timetuple())
+    return int(value.timestamp())
+
+
+def parse_duration(value: str) -> Optional[int]:
+    """Convert an RFC 5545 DURATION (e.g. PT1H30M) to seconds"""
+    match = _DURATION_RE.match(value.strip())
+    if not match:
+        return None
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    total = (
+        int(weeks or 0) * 604800
+        + int(days or 0) * 86400
+        + int(hours or 0) * 3600
+        + int(minutes or 0) * 60
+        + int(seconds or 0)
+    )
+    return -total if sign == "-" else total
+
+
+def _tzid(params: str) -> Optional[str]:
+    for param in params.split(";"):
+        if param.upper().startswith("TZID="):
+            return param[5:]
+    return None
+
+
+def parse_vevent(text: str) -> EventRecord:
+    """Parse the first VEVENT in ``text`` into an EventRecord.
+
+    Components around or inside the event (VTIMEZONE, VALARM) are skipped.
+    Text without a BEGIN:VEVENT line is treated as a bare property list so
+    hand-written payloads still parse. When the event has a UID, ``id`` is
+    set to its iCalendar identity: the UID, plus "/" and the RECURRENCE-ID
+    in UTC for an overridden instance of a recurring event.
+    """
+    uid = start = end = duration = recurrence_id = None
+    summary = location = description = ""
+    depth = 0  # nesting of components other than VCALENDAR/VEVENT
+
+    for line in unfold_lines(text):
+        name, sep, value = line.partition(":")
+        if not sep:
+            continue
+        name, _, params = name.partition(";")
+        name = name.strip().upper()
+
+        if name == "BEGIN":
+            component = value.strip().upper()
+            if component != "VCALENDAR" and not (component == "VEVENT" and depth == 0):
+                depth += 1
+            continue
+        if name == "END":
+            component = value.strip().upper()
+            if depth:
+                depth -= 1
+            elif component == "VEVENT":
+                break
+            continue
+        if depth:
+            continue
+
+        if name == "SUMMARY":
+            summary = unescape_text(value.strip())
+        elif name == "LOCATION":
+            location = unescape_text(value.strip())
+        elif name == "DESCRIPTION":
+            description = unescape_text(value.strip())
+        elif name == "UID":
+            uid = value.strip() or None
+        elif name == "RECURRENCE-ID":
+            recurrence_id = _instance_key(value, _tzid(params))
+        elif name == "DTSTART":
+            start = parse_datetime(value, _tzid(params))
+        elif name == "DTEND":
+            end = parse_datetime(value, _tzid(params))
+        elif name == "DURATION":
+            duration = parse_duration(value)
+
+    if end is None and start is not None:
+        end = start + duration if duration is not None else start
+
+    if uid is not None and recurrence_id is not None:
+        event_id = f"{uid}/{recurrence_id}"
+    else:
+        event_id = uid
+    return EventRecord(uid, start, end, summary, location, description, text, event_id)
+
+
+def _instance_key(value: str, tzid: Optional[str]) -> str:
+    # the same instant written with different zones gives the same key
+    epoch = parse_datetime(value, tzid)
+    if epoch is None:
+        return value.strip()
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+class CalendarSplitter:
+    """Incremental VCALENDAR -> VEVENT splitter for uploads of any size.
+
+    feed() takes raw bytes as they arrive and returns the items completed
+    so far; close() returns the rest. Only the current line and the event
+    being collected are held in memory. Each item is ``(text, None)`` for a
+    VEVENT, with the VTIMEZONE blocks it references (seen earlier in the
+    file) in front of it, as POST /events/add expects, or ``(None, error)``
+    for one that could not be used. Continuation lines are unfolded. Lines
+    may end in CRLF, LF or a bare CR. A line longer than MAX_EVENT_CHARS is
+    cut short there, so it is never buffered whole; the event it belongs
+    to is then reported as too large.
+    """
+
+    MAX_EVENT_CHARS = 1_000_000
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial = ""  # physical line still being received
+        self._current: Optional[str] = None  # logical line being unfolded
+        self._first = True
+        self._timezones: Dict[str, str] = {}  # TZID -> VTIMEZONE text
+        self._block: Optional[list] = None  # lines of the VEVENT/VTIMEZONE being collected
+        self._kind = ""
+        self._depth = 0  # components nested inside the collected block
+        self._size = 0
+        self._tzids: set = set()
+        self._too_large = False
+
+    def feed(self, chunk: bytes) -> list:
+        text = self._partial + self._decoder.decode(chunk)
+        if self._first and text:
+            text = text.lstrip("\ufeff")
+            self._first = False
+        # a CR at the very end may be the first half of a CRLF
+        cut = len(text) - 1 if text.endswith("\r") else len(text)
+        lines = _LINE_END_RE.split(text[:cut])
+        self._partial = lines.pop()[:self.MAX_EVENT_CHARS + 1] + text[cut:]
+        items = []
+        for line in lines:
+            self._physical(line[:self.MAX_EVENT_CHARS + 1], items)
+        return items
+
+    def close(self) -> list:
+        items = []
+        tail = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        lines = _LINE_END_RE.split(tail)
+        if not lines[-1]:
+            lines.pop()
+        for line in lines:
+            self._physical(line[:self.MAX_EVENT_CHARS + 1], items)
+        if self._current is not None:
+            self._logical(self._current, items)
+            self._current = None
+        if self._block is not None and self._kind == "VEVENT":
+            items.append((None, "VEVENT is not terminated by END:VEVENT"))
+        self._block = None
+        return items
+
+    def _physical(self, line: str, items: list) -> None:
+        if line[:1] in (" ", "\t") and self._current is not None:
+            if len(self._current) <= self.MAX_EVENT_CHARS:
+                self._current = (self._current + line[1:])[:self.MAX_EVENT_CHARS + 1]
+            return
+        if self._current is not None:
+            self._logical(self._current, items)
+        self._current = line
+
+    def _logical(self, line: str, items: list) -> None:
+        name, sep, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.strip().upper()
+        component = value.strip().upper() if name in ("BEGIN", "END") else ""
+
+        if self._block is None:
+            if name == "BEGIN" and component in ("VEVENT", "VTIMEZONE"):
+                self._start(component, line)
+            return
+
+        if name == "BEGIN":
+            self._depth += 1
+        elif name == "END" and self._depth:
+            self._depth -= 1
+        elif name == "END" and component == self._kind:
+            self._block.append(line)
+            self._finish(items)
+            return
+        elif sep and params and self._kind == "VEVENT":
+            tzid = _tzid(params)
+            if tzid:
+                self._tzids.add(tzid.strip('"'))
+
+        self._size += len(line) + 1
+        if self._size > self.MAX_EVENT_CHARS:
+            self._too_large = True
+            self._block = self._block[:1]  # keep skipping to the END line
+        else:
+            self._block.append(line)
+
+    def _start(self, kind: str, line: str) -> None:
+        self._block = [line]
+        self._kind = kind
+        self._depth = 0
+        self._size = len(line)
+        self._tzids = set()
+        self._too_large = False
+
+    def _finish(self, items: list) -> None:
+        block, self._block = self._block, None
+        if self._too_large:
+            if self._kind == "VEVENT":
+                items.append((None, f"VEVENT is larger than {self.MAX_EVENT_CHARS} characters"))
+            return
+        text = "\n".join(block)
+        if self._kind == "VTIMEZONE":
+            for line in block:
+                name, sep, value = line.partition(":")
+                if sep and name.strip().upper() == "TZID":
+                    self._timezones[value.strip()] = text + "\n"
+                    break
+            return
+        prefix = "".join(self._timezones[t] for t in sorted(self._tzids) if t in self._timezones)
+        items.append((prefix + text, None))
+
+
+def fold_line(line: str) -> str:
+    """RFC 5545 folding: lines longer than 75 octets continue on CRLF + space"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts = []
+    start = 0
+    limit = 75
+    while len(data) - start > limit:
+        end = start + limit
+        while data[end] & 0xC0 == 0x80:  # never split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode())
+        start = end
+        limit = 74  # continuation lines start with the space
+    parts.append(data[start:].decode())
+    return "\r\n ".join(parts)
+
+
+def _content_lines(text: str) -> list:
+    return [fold_line(line) for line in unfold_lines(text) if line.strip()]
+
+
+def _dtstamp(record: EventRecord, lines) -> str:
+    # taken from the event rather than the clock, so an unchanged event
+    # renders to the same bytes every time
+    for line in lines:
+        name, _, value = line.partition(":")
+        if name.upper() in ("LAST-MODIFIED", "CREATED") and value.strip().endswith("Z"):
+            return value.strip()
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(record.start or 0))
+
+
+def render_vevent(record: EventRecord) -> Tuple[Tuple[str, ...], str]:
+    """A stored event as feed text: its VTIMEZONE blocks and its VEVENT,
+    folded with CRLF line ends. UID and DTSTAMP, required in a published
+    VEVENT, are added when the stored text lacks them; DTSTAMP is the
+    event's LAST-MODIFIED or CREATED time, else its start."""
+    raw = record.raw
+    match = _VEVENT_RE.search(raw)
+    if match is None:
+        lines = ["BEGIN:VEVENT", *_content_lines(raw), "END:VEVENT"]
+        timezones = ()
+    else:
+        lines = _content_lines(match.group())
+        timezones = tuple(
+            component_table.intern("\r\n".join(_content_lines(tz.group())) + "\r\n")
+            for tz in _VTIMEZONE_RE.finditer(raw[:match.start()])
+        )
+    names = {line.partition(":")[0].partition(";")[0].upper() for line in lines}
+    if "UID" not in names:
+        lines.insert(1, fold_line(f"UID:{record.id}"))
+    if "DTSTAMP" not in names:
+        lines.insert(1, f"DTSTAMP:{_dtstamp(record, lines)}")
+    return timezones, "\r\n".join(lines) + "\r\n"
@@ -0,0 +1,72 @@
+"""
+Incremental parser for a JSON array of objects arriving in pieces.
+
+Used to turn a token-by-token LLM stream into complete objects as soon as
+each one closes, without waiting for the whole array.
+"""
+
+import json
+from typing import List
+
+
+class JSONArrayStreamParser:
+    """Feed text chunks, get back every top-level object completed so far.
+
+    Text before the first ``[`` (prose, markdown fences) is ignored, and so
+    is anything after the matching ``]``. Objects that fail to decode are
+    skipped rather than aborting the stream.
+    """
+
+    def __init__(self) -> None:
+        self._started = False
+        self._finished = False
+        self._depth = 0  # nesting inside the array; 0 = between elements
+        self._in_string = False
+        self._escape = False
+        self._buffer: List[str] = []  # characters of the current element
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[dict]:
+        objects = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer = [ch]
+                elif ch == "]":
+                    self._finished = True
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads("".join(self._buffer))
+                    except json.JSONDecodeError:
+                        value = None
+                    if isinstance(value, dict):
+                        objects.append(value)
+                    self._buffer = []
+        return objects
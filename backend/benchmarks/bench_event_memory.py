@@ -0,0 +1,107 @@
+"""
+Memory per stored event with and without shared VTIMEZONE text.
+
+Run from the backend directory:
+    python -m benchmarks.bench_event_memory
+
+Stores 10,000 events for each of 5 users, every one sent the way the
+mobile client sends them (a full VTIMEZONE block in front of the VEVENT),
+first keeping each event's text whole, as before, then with the
+VTIMEZONE blocks interned in component_table. Memory is what
+tracemalloc sees retained once the request payloads are gone; the read
+column is the cost of to_dict() on every event, which now joins the text
+back together.
+"""
+
+import gc
+import time
+import tracemalloc
+
+from app.database.connection import InMemoryDB, StoredUser
+from app.services.events_service import EventsService
+from app.utils import ical
+
+USERS = 5
+EVENTS_PER_USER = 10_000
+
+VTIMEZONE = """BEGIN:VTIMEZONE
+TZID:Europe/Berlin
+X-LIC-LOCATION:Europe/Berlin
+BEGIN:DAYLIGHT
+TZOFFSETFROM:+0100
+TZOFFSETTO:+0200
+TZNAME:CEST
+DTSTART:19700329T020000
+RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU
+END:DAYLIGHT
+BEGIN:STANDARD
+TZOFFSETFROM:+0200
+TZOFFSETTO:+0100
+TZNAME:CET
+DTSTART:19701025T030000
+RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU
+END:STANDARD
+END:VTIMEZONE
+"""
+
+
+def make_vevent(user: int, i: int) -> str:
+    day = 1 + i % 28
+    hour = 6 + i % 14
+    return (
+        VTIMEZONE
+        + "BEGIN:VEVENT\n"
+        + f"UID:{user}-{i}@ai-calendar\n"
+        + f"SUMMARY:{('Study', 'Gym', 'Fajr prayer', 'Team meeting')[i % 4]} {i}\n"
+        + f"DTSTART;TZID=Europe/Berlin:2025{1 + i % 12:02d}{day:02d}T{hour:02d}0000\n"
+        + f"DTEND;TZID=Europe/Berlin:2025{1 + i % 12:02d}{day:02d}T{hour:02d}4500\n"
+        + "END:VEVENT"
+    )
+
+
+def build(shared: bool):
+    """Store every event; returns (db, retained bytes, seconds per full read)"""
+    original = ical.split_components
+    if not shared:
+        ical.split_components = lambda text: text
+    gc.collect()
+    tracemalloc.start()
+    try:
+        db = InMemoryDB()
+        service = EventsService(db)
+        for user in range(USERS):
+            db.create_user(StoredUser(id=f"user-{user}", name="U", email=f"u{user}@example.com", password="x"))
+            for start in range(0, EVENTS_PER_USER, 500):
+                payloads = [make_vevent(user, i) for i in range(start, start + 500)]
+                service.add_events_to_user(f"user-{user}", payloads)
+                del payloads
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        ical.split_components = original
+
+    started = time.perf_counter()
+    for user in range(USERS):
+        for event in db.get_events(f"user-{user}"):
+            event.to_dict()
+    return db, retained, time.perf_counter() - started
+
+
+def main() -> None:
+    total = USERS * EVENTS_PER_USER
+    print(f"{USERS} users x {EVENTS_PER_USER:,} events, VTIMEZONE block {len(VTIMEZONE)} bytes")
+    print(f"{'':8s} {'bytes/event':>12s} {'total MB':>9s} {'read ms':>8s}")
+    results = {}
+    for name, shared in (("before", False), ("after", True)):
+        db, retained, read = build(shared)
+        results[name] = retained
+        print(f"{name:8s} {retained / total:12.0f} {retained / 1e6:9.1f} {read * 1000:8.0f}")
+        assert db.get_events("user-0")[7].raw == make_vevent(0, 7)
+        del db
+    print(f"saved {(1 - results['after'] / results['before']) * 100:.0f}%"
+          f"; shared table: {ical.component_table.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark the rule-based fallback scheduler.
+
+Run from the backend directory:
+    python -m benchmarks.bench_fallback_rules
+
+Compares the previous chain of ``keyword in prompt`` checks (kept below as
+legacy_fallback_events) with the compiled rule table in
+app.services.fallback_service, after checking both produce identical
+schedules for every prompt in the corpus.
+"""
+
+import time
+from datetime import datetime
+
+from app.database.schemas import EventItem, ScheduleResponse
+from app.services.fallback_service import create_fallback_events
+
+ROUNDS = 2_000
+
+PROMPTS = [
+    "I want to wake up and pray all prayers then eat breakfast",
+    "study for 3 hours at 4pm",
+    "gym at 7am then shower and go to work at 9:30",
+    "homework after dinner",
+    "remind me to call mom",
+    "pray fajr at dawn",
+    "dhuhr prayer and lunch with the team",
+    "read a book in the afternoon and pray asr",
+    "maghrib salah at sunset",
+    "isha namaz tonight",
+    "salat",
+    "morning routine: wash, breakfast, then office meeting at 10",
+    "go for a run and then a jog with friends",
+    "research paper deadline, learn numpy for 2 hours",
+    "a an the",
+    "buy groceries, pick up laundry, fix the bike, call plumber, pay rent",
+    "meeting with the job recruiter at 12am",
+    "Bath time for the kids at 8pm followed by reading",
+    "Every day I want fitness training",
+    "food shopping and workout",
+    "x",
+    "",
+    "Schedule my entire week: work 9-5, gym, study, pray each prayer, eat dinner at 7",
+]
+
+
+def legacy_fallback_events(prompt: str, today: datetime) -> ScheduleResponse:
+    """
+    Smart fallback that understands natural language and creates structured events.
+    Works without any AI APIs - uses pattern matching and intelligent parsing.
+    """
+    prompt_lower = prompt.lower()
+    events = []
+    current_time = 6  # Start at 6 AM for morning routines
+    
+    # Helper to add event with auto-incrementing time
+    def add_event(title, start_hour, start_min, duration_min=30, location="", desc=""):
+        start_time_str = f"{start_hour:02d}:{start_min:02d}"
+        end_hour = start_hour + (start_min + duration_min) // 60
+        end_min = (start_min + duration_min) % 60
+        end_time_str = f"{end_hour:02d}:{end_min:02d}"
+        events.append(EventItem(
+            title=title,
+            date=today.strftime('%Y-%m-%d'),
+            start_time=start_time_str,
+            end_time=end_time_str,
+            location=location,
+            description=desc or title
+        ))
+        return end_hour, end_min
+    
+    # Parse time mentions
+    import re
+    time_patterns = {
+        r'(\d{1,2})\s*(am|pm|:|\s)': None,  # Will extract in code
+        r'morning': (6, 0),
+        r'afternoon': (13, 0),
+        r'evening': (17, 0),
+        r'night': (20, 0),
+        r'early\s*morning': (5, 0),
+        r'late\s*night': (22, 0),
+    }
+    
+    # Extract explicit times
+    time_matches = re.findall(r'(\d{1,2}):?(\d{2})?\s*(am|pm)?', prompt_lower)
+    parsed_times = []
+    for match in time_matches:
+        hour = int(match[0])
+        minute = int(match[1]) if match[1] else 0
+        if match[2] == 'pm' and hour < 12:
+            hour += 12
+        elif match[2] == 'am' and hour == 12:
+            hour = 0
+        parsed_times.append((hour, minute))
+    
+    # MORNING ROUTINE DETECTION
+    if "wake" in prompt_lower or ("morning" in prompt_lower and "routine" in prompt_lower):
+        hour, minute = add_event("Wake Up", 6, 0, 15, "Home", "Morning wake up")
+        current_time = hour
+        current_min = minute
+    
+    # PRAYER DETECTION - Smart prayer parsing
+    prayer_keywords = ["pray", "prayer", "salah", "salat", "namaz"]
+    has_prayer = any(kw in prompt_lower for kw in prayer_keywords)
+    
+    if has_prayer:
+        # Check for "all prayers" or similar
+        if any(word in prompt_lower for word in ["all", "every", "all of", "each"]):
+            # All 5 prayers
+            prayers = [
+                ("Fajr Prayer", 5, 30, 30),
+                ("Dhuhr Prayer", 12, 30, 30),
+                ("Asr Prayer", 15, 30, 30),
+                ("Maghrib Prayer", 18, 30, 30),
+                ("Isha Prayer", 20, 0, 30),
+            ]
+            for title, h, m, d in prayers:
+                add_event(title, h, m, d, "", "Prayer time")
+        else:
+            # Single prayer - infer from time or use default
+            if "fajr" in prompt_lower or "dawn" in prompt_lower:
+                add_event("Fajr Prayer", 5, 30, 30)
+            elif "dhuhr" in prompt_lower or "zuhr" in prompt_lower or "noon" in prompt_lower:
+                add_event("Dhuhr Prayer", 12, 30, 30)
+            elif "asr" in prompt_lower or "afternoon" in prompt_lower:
+                add_event("Asr Prayer", 15, 30, 30)
+            elif "maghrib" in prompt_lower or "sunset" in prompt_lower:
+                add_event("Maghrib Prayer", 18, 30, 30)
+            elif "isha" in prompt_lower or "night" in prompt_lower:
+                add_event("Isha Prayer", 20, 0, 30)
+            else:
+                # Default prayer time
+                add_event("Prayer", 12, 0, 30)
+    
+    # SEQUENTIAL ACTIVITY PARSING
+    # Look for "and", "then", "after" to chain events
+    connectors = [" and ", " then ", " after ", ", then ", ", and ", " followed by "]
+    has_connectors = any(conn in prompt_lower for conn in connectors)
+    
+    # BREAKFAST/MEAL
+    if any(word in prompt_lower for word in ["breakfast", "eat", "meal", "food", "lunch", "dinner"]):
+        if "breakfast" in prompt_lower:
+            add_event("Breakfast", 8, 0, 30, "Kitchen", "Morning meal")
+        elif "lunch" in prompt_lower:
+            add_event("Lunch", 13, 0, 45, "", "Midday meal")
+        elif "dinner" in prompt_lower:
+            add_event("Dinner", 19, 0, 60, "", "Evening meal")
+        else:
+            add_event("Meal", 8, 0, 30, "Kitchen", "Meal time")
+    
+    # STUDY/LEARNING
+    if any(word in prompt_lower for word in ["study", "learn", "homework", "read", "research"]):
+        # Try to extract duration
+        duration = 120  # Default 2 hours
+        if "hour" in prompt_lower:
+            hour_match = re.search(r'(\d+)\s*hour', prompt_lower)
+            if hour_match:
+                duration = int(hour_match.group(1)) * 60
+        
+        # Try to extract time
+        if parsed_times:
+            h, m = parsed_times[0]
+            add_event("Study Session", h, m, duration, "", "Study time")
+        else:
+            add_event("Study Session", 9, 0, duration, "", "Study time")
+    
+    # EXERCISE/WORKOUT
+    if any(word in prompt_lower for word in ["exercise", "workout", "gym", "run", "jog", "fitness"]):
+        add_event("Exercise", 7, 0, 60, "Gym", "Physical activity")
+    
+    # SHOWER/BATH
+    if any(word in prompt_lower for word in ["shower", "bath", "wash"]):
+        add_event("Shower", 7, 30, 20, "Bathroom", "Personal hygiene")
+    
+    # WORK
+    if any(word in prompt_lower for word in ["work", "job", "office", "meeting"]):
+        if parsed_times:
+            h, m = parsed_times[0]
+            add_event("Work", h, m, 480, "Office", "Work time")  # 8 hours
+        else:
+            add_event("Work", 9, 0, 480, "Office", "Work time")
+    
+    # If no specific patterns matched, create intelligent events from keywords
+    if not events:
+        # Try to extract main activity
+        words = prompt_lower.split()
+        # Remove common words
+        stop_words = {"i", "want", "to", "in", "the", "and", "a", "an", "at", "on", "for", "with"}
+        meaningful_words = [w for w in words if w not in stop_words and len(w) > 2]
+        
+        if meaningful_words:
+            title = " ".join(meaningful_words[:4]).title()
+            add_event(title, 12, 0, 60, "", prompt)
+        else:
+            # Last resort
+            title = prompt[:50] if len(prompt) > 50 else prompt
+            add_event(title, 12, 0, 60, "", prompt)
+    
+    # Sort events by time
+    events.sort(key=lambda e: (e.date, e.start_time))
+    
+    return ScheduleResponse(
+        events=events,
+        summary=f"✅ Created {len(events)} event(s) using smart fallback mode (no AI needed)",
+        source="fallback",
+    )
+
+
+if __name__ == "__main__":
+    today = datetime(2025, 1, 15)
+    for prompt in PROMPTS:
+        expected = legacy_fallback_events(prompt, today).model_dump()
+        assert create_fallback_events(prompt, today).model_dump() == expected, prompt
+    print(f"outputs identical for {len(PROMPTS)} prompts")
+
+    calls = ROUNDS * len(PROMPTS)
+    for name, fn in (("legacy keyword checks", legacy_fallback_events),
+                     ("compiled rule table", create_fallback_events)):
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for prompt in PROMPTS:
+                fn(prompt, today)
+        elapsed = time.perf_counter() - start
+        print(f"{name:22s} {elapsed:.2f}s ({calls / elapsed:,.0f} prompts/s)")
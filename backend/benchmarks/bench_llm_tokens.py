@@ -0,0 +1,160 @@
+"""
+Benchmark LLM tokens and latency per /chat/generate request.
+
+Run from the backend directory:
+    python -m benchmarks.bench_llm_tokens
+
+Sends every prompt of the fallback corpus to a local stub of Ollama's
+/api/generate, first the way requests used to be built (instructions and
+user text in one prompt, num_predict=2000, free-form output) and then the
+current way (fixed system prefix, format=EVENT_LIST_SCHEMA, num_predict
+sized to the request).
+
+The stub behaves like Ollama where it matters here: a prompt prefix
+identical to the previous request's is not evaluated again, and it reports
+prompt_eval_count / eval_count plus durations. Its replies are the
+rule-based schedule for the prompt: wrapped in prose and a markdown fence
+when unconstrained, bare JSON when a format is given, cut off at
+num_predict. Durations are modelled from token counts at typical CPU
+speeds, so the latency column compares the two modes rather than predicting
+real numbers.
+"""
+
+import asyncio
+import json
+import os
+import re
+from datetime import datetime, timedelta
+
+import httpx
+
+# nothing is stored; leave the server's DB_DATA_DIR alone
+os.environ["DB_DATA_DIR"] = ""
+
+from app.api.routes import chat
+from app.services.fallback_service import create_fallback_events
+from app.services.ollama_service import ollama_client
+from benchmarks.bench_fallback_rules import PROMPTS
+
+MODEL = "stub"
+CHARS_PER_TOKEN = 4
+PROMPT_EVAL_MS_PER_TOKEN = 15  # ~65 tokens/s
+EVAL_MS_PER_TOKEN = 80  # ~12 tokens/s
+
+
+def legacy_build_ai_prompt(user_prompt: str, today: datetime, tomorrow: datetime) -> str:
+    """The single prompt sent before the system prefix was split out"""
+    return f"""You are an intelligent calendar assistant that understands natural language and creates well-organized calendar events.
+
+USER REQUEST: "{user_prompt}"
+
+CONTEXT:
+- Today is {today.strftime('%A')}, {today.strftime('%Y-%m-%d')}
+- Tomorrow is {tomorrow.strftime('%Y-%m-%d')}
+- Current time context: Use today's date unless the user specifies otherwise (e.g., "tomorrow", "Monday", "next week")
+
+""" + chat.SYSTEM_PROMPT.split("\n\n", 1)[1] + """
+Now analyze the user's request and create the events:"""
+
+
+class StubOllama:
+    def __init__(self) -> None:
+        self.last_input = ""
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        full_input = (body.get("system") or "") + body["prompt"]
+        shared = 0
+        for a, b in zip(self.last_input, full_input):
+            if a != b:
+                break
+            shared += 1
+        self.last_input = full_input
+        prompt_tokens = (len(full_input) - shared) // CHARS_PER_TOKEN + 1
+
+        user_text = re.search(r'USER REQUEST: "(.*)"', body["prompt"]).group(1)
+        events = [e.model_dump() for e in create_fallback_events(user_text, datetime.now()).events]
+        if body.get("format"):
+            reply = json.dumps(events)
+        else:
+            reply = (
+                "Here is your schedule based on your request:\n\n```json\n"
+                + json.dumps(events, indent=2)
+                + "\n```\n\nEach event has a realistic duration. Let me know if you "
+                "would like to adjust any of the times!"
+            )
+        budget = body["options"].get("num_predict", 128)
+        eval_tokens = min(len(reply) // CHARS_PER_TOKEN + 1, budget)
+        reply = reply[: eval_tokens * CHARS_PER_TOKEN]
+
+        prompt_ms = prompt_tokens * PROMPT_EVAL_MS_PER_TOKEN
+        eval_ms = eval_tokens * EVAL_MS_PER_TOKEN
+        self.calls.append((prompt_tokens, eval_tokens, prompt_ms + eval_ms))
+        return httpx.Response(200, json={
+            "model": body["model"],
+            "response": reply,
+            "done": True,
+            "done_reason": "stop" if eval_tokens < budget else "length",
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": eval_tokens,
+            "prompt_eval_duration": prompt_ms * 1_000_000,
+            "eval_duration": eval_ms * 1_000_000,
+            "total_duration": (prompt_ms + eval_ms) * 1_000_000,
+        })
+
+
+async def run(stub: StubOllama, today: datetime, current: bool) -> int:
+    """Send every prompt once; returns how many replies parsed into events"""
+    tomorrow = today + timedelta(days=1)
+    parsed = 0
+    for user_prompt in PROMPTS:
+        if current:
+            text = await chat.call_ollama(
+                chat._build_ai_prompt(user_prompt, today, tomorrow),
+                model=MODEL,
+                system=chat.SYSTEM_PROMPT,
+                max_tokens=chat._num_predict(user_prompt, today),
+            )
+        else:
+            response = await ollama_client.generate(
+                MODEL,
+                legacy_build_ai_prompt(user_prompt, today, tomorrow),
+                options={"temperature": 0.3, "num_predict": 2000},
+            )
+            text = response.json()["response"]
+        parsed += bool(chat._parse_ai_response(text, today))
+    return parsed
+
+
+def report(name: str, calls, parsed: int) -> None:
+    n = len(calls)
+    print(
+        f"{name:7s} prompt_eval {sum(c[0] for c in calls) / n:7.1f} tok/req"
+        f"   eval {sum(c[1] for c in calls) / n:6.1f} tok/req"
+        f"   latency {sum(c[2] for c in calls) / n:7.0f} ms/req"
+        f"   parsed {parsed}/{n}"
+    )
+
+
+async def main() -> None:
+    today = datetime.now()
+    before, after = StubOllama(), StubOllama()
+
+    ollama_client._transport = httpx.MockTransport(before)
+    parsed_before = await run(before, today, current=False)
+    await ollama_client.aclose()
+    ollama_client._transport = httpx.MockTransport(after)
+    parsed_after = await run(after, today, current=True)
+    await ollama_client.aclose()
+
+    print(f"{'prompt':40s} {'before p/e/ms':>20s} {'after p/e/ms':>20s}")
+    for prompt, b, a in zip(PROMPTS, before.calls, after.calls):
+        print(f"{prompt[:40]:40s} {'%d/%d/%d' % b:>20s} {'%d/%d/%d' % a:>20s}")
+    print()
+    report("before", before.calls, parsed_before)
+    report("after", after.calls, parsed_after)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""
+Microbenchmark for InMemoryDB.get_by_email.
+
+Run from the backend directory:
+    python -m benchmarks.bench_user_lookup
+
+Lookup cost should stay flat as the number of users grows.
+"""
+
+import random
+import time
+
+from app.database.connection import InMemoryDB, StoredUser
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 100_000
+
+
+def build_db(n: int) -> InMemoryDB:
+    db = InMemoryDB()
+    for i in range(n):
+        # model_construct skips validation so building 1M users stays cheap
+        db.create_user(StoredUser.model_construct(
+            id=f"user-{i}",
+            name=f"User {i}",
+            email=f"User{i}@Example.com",
+            password="secret",
+            events={},
+        ))
+    return db
+
+
+def bench(n: int) -> float:
+    db = build_db(n)
+    emails = [f"user{random.randrange(n)}@example.com" for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for email in emails:
+        assert db.get_by_email(email) is not None
+    return (time.perf_counter() - start) / LOOKUPS * 1e9
+
+
+if __name__ == "__main__":
+    print(f"{'users':>10} | ns/lookup")
+    for size in SIZES:
+        print(f"{size:>10} | {bench(size):9.0f}")
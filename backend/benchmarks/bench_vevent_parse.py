@@ -0,0 +1,63 @@
+"""
+Benchmark parse_vevent on a 100k-event calendar.
+
+Run from the backend directory:
+    python -m benchmarks.bench_vevent_parse
+
+Compares parsing every event on each read (the old behaviour) with parsing
+once at ingest and serving the stored records.
+"""
+
+import time
+
+from app.utils.ical import parse_vevent
+
+EVENTS = 100_000
+READS = 5
+
+VTIMEZONE = """BEGIN:VTIMEZONE
+TZID:Europe/Berlin
+BEGIN:STANDARD
+DTSTART:19701025T030000
+TZOFFSETFROM:+0200
+TZOFFSETTO:+0100
+END:STANDARD
+END:VTIMEZONE
+"""
+
+
+def make_vevent(i: int) -> str:
+    day = 1 + i % 28
+    hour = i % 24
+    return (
+        VTIMEZONE
+        + "BEGIN:VEVENT\n"
+        + f"UID:event-{i}@calendar\n"
+        + f"SUMMARY:Event number {i}\n"
+        + "DESCRIPTION:Generated for benchmarking\\nsecond line\n"
+        + "LOCATION:Office\n"
+        + f"DTSTART;TZID=Europe/Berlin:202501{day:02d}T{hour:02d}0000\n"
+        + f"DTEND;TZID=Europe/Berlin:202501{day:02d}T{hour:02d}3000\n"
+        + "END:VEVENT"
+    )
+
+
+if __name__ == "__main__":
+    payloads = [make_vevent(i) for i in range(EVENTS)]
+
+    start = time.perf_counter()
+    records = [parse_vevent(p) for p in payloads]
+    ingest = time.perf_counter() - start
+    print(f"parse {EVENTS} events: {ingest:.2f}s ({EVENTS / ingest:,.0f} events/s)")
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        [parse_vevent(p).to_dict() for p in payloads]
+    reparse = (time.perf_counter() - start) / READS
+    print(f"read with re-parse:    {reparse * 1000:.0f} ms/read")
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        [r.to_dict() for r in records]
+    stored = (time.perf_counter() - start) / READS
+    print(f"read stored records:   {stored * 1000:.0f} ms/read")
@@ -0,0 +1,126 @@
+"""
+Benchmark DurableDB startup recovery and write throughput.
+
+Run from the backend directory:
+    python -m benchmarks.bench_wal_recovery [events]
+
+Stores ``events`` events (default 1M) across 1,000 users in a temporary
+directory, then measures how long a fresh DurableDB takes to come back up
+from the log alone, and from a snapshot plus a 10,000-record log tail.
+It first times single-event writes from 1 and 16 threads, where group
+commit lets concurrent writers share fsyncs.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from app.database.connection import StoredUser
+from app.database.durable_store import DurableDB
+from app.utils.ical import EventRecord
+
+USERS = 1_000
+TAIL = 10_000
+WRITES = 2_000
+DAY = 86_400
+
+
+def make_event(user: int, i: int) -> EventRecord:
+    start = 1_735_689_600 + (i * 7919 % 365) * DAY + (i % 12) * 3600
+    raw = (
+        f"BEGIN:VEVENT\nUID:u{user}-e{i}\nSUMMARY:Event {i}\n"
+        f"DTSTART:{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(start))}\n"
+        f"DTEND:{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(start + 3600))}\nEND:VEVENT"
+    )
+    return EventRecord(f"u{user}-e{i}", start, start + 3600, f"Event {i}", "", "", raw, f"u{user}-e{i}")
+
+
+def populate(db: DurableDB, events: int) -> None:
+    per_user = events // USERS
+    for user in range(USERS):
+        db.create_user(StoredUser(id=f"user-{user}", name=f"User {user}", email=f"user{user}@example.com", password="secret"))
+        db.add_events(f"user-{user}", [make_event(user, i) for i in range(per_user)])
+
+
+def recover(directory: str) -> float:
+    start = time.perf_counter()
+    db = DurableDB(directory, snapshot_bytes=1 << 62)
+    elapsed = time.perf_counter() - start
+    stats = db.stats()
+    print(
+        f"  {elapsed:7.2f} s   snapshot events {stats['recovered_events']:>9,}"
+        f"   replayed log records {stats['replayed_records']:>9,}"
+    )
+    db.close()
+    return elapsed
+
+
+def disk_usage(directory: str) -> str:
+    return ", ".join(
+        f"{name} {os.path.getsize(os.path.join(directory, name)) / 1e6:.0f} MB"
+        for name in sorted(os.listdir(directory))
+    )
+
+
+def bench_writes(directory: str, threads: int) -> None:
+    db = DurableDB(directory, snapshot_bytes=1 << 62)
+    db.create_user(StoredUser(id=f"writer-{threads}", name="W", email=f"w{threads}@example.com", password="x"))
+    per_thread = WRITES // threads
+
+    def write(t: int) -> None:
+        for i in range(per_thread):
+            db.add_event(f"writer-{threads}", make_event(t, i + 1_000_000 * t))
+
+    workers = [threading.Thread(target=write, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    stats = db.stats()
+    print(
+        f"  {threads:2d} thread(s): {per_thread * threads / elapsed:8.0f} writes/s"
+        f"   {stats['records'] / max(1, stats['flushes']):5.1f} records per fsync"
+    )
+    db.close()
+
+
+def main() -> None:
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    directory = tempfile.mkdtemp(prefix="wal-bench-")
+    try:
+        # first, while the heap is small, so garbage collection stays out of it
+        print(f"{WRITES:,} single-event writes with fsync:")
+        for threads in (1, 16):
+            bench_writes(directory, threads)
+        shutil.rmtree(directory)
+        os.makedirs(directory)
+
+        start = time.perf_counter()
+        db = DurableDB(directory, fsync=False, snapshot_bytes=1 << 62)
+        populate(db, events)
+        db.close()
+        print(f"wrote {events:,} events in {time.perf_counter() - start:.1f} s ({disk_usage(directory)})")
+
+        print("recovery from the log only:")
+        recover(directory)
+
+        db = DurableDB(directory, fsync=False, snapshot_bytes=1 << 62)
+        start = time.perf_counter()
+        db.snapshot()
+        print(f"snapshot written in {time.perf_counter() - start:.1f} s")
+        for i in range(TAIL):
+            db.add_event(f"user-{i % USERS}", make_event(i % USERS, 10_000_000 + i))
+        db.close()
+        print(f"recovery from snapshot + {TAIL:,}-record tail ({disk_usage(directory)}):")
+        recover(directory)
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
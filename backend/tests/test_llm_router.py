@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from app.services.llm_router import CallableProvider, LLMRouter
+
+
+def _stub(name: str, delay: float) -> CallableProvider:
+    async def complete(prompt, system=None, max_tokens=None):
+        await asyncio.sleep(delay)
+        return f"{name}:{prompt}"
+
+    return CallableProvider(name, complete)
+
+
+def test_always_losing_provider_stops_being_tried_first():
+    router = LLMRouter(
+        [_stub("ollama", 2.0), _stub("openai", 0.01)],
+        hedge_delay=0.2,
+        min_samples=3,
+    )
+
+    async def run():
+        timings = []
+        for i in range(8):
+            started = time.monotonic()
+            result = await router.complete(str(i))
+            timings.append(time.monotonic() - started)
+            assert result.provider == "openai"
+        return timings
+
+    timings = asyncio.run(run())
+
+    assert [p.name for p in router.ranked()] == ["openai", "ollama"]
+    # once openai is measured it starts at once instead of after the hedge delay
+    assert all(t < 0.15 for t in timings[3:])
+    assert router.hedges == 3
+
+
+def test_hedge_loser_time_is_not_a_latency_sample():
+    router = LLMRouter([_stub("slow", 2.0), _stub("fast", 0.01)], hedge_delay=0.05)
+
+    asyncio.run(router.complete("x"))
+
+    assert len(router.latency["slow"].samples) == 0
+    assert len(router.latency["fast"].samples) == 1
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime
+
+from app.database.schemas import EventItem, ScheduleResponse
+from app.services.semantic_cache import HashingEmbedder, SemanticCache
+
+TODAY = datetime(2024, 5, 1, 8, 0)
+PROMPT = "study math then go to the gym in the morning"
+
+
+def _response(title: str) -> ScheduleResponse:
+    return ScheduleResponse(
+        events=[EventItem(title=title, date="2024-05-01", start_time="09:00", end_time="10:00")],
+        source="ollama",
+    )
+
+
+def _lookup(stored: str, asked: str):
+    cache = SemanticCache(HashingEmbedder())
+
+    async def run():
+        await cache.put(stored, TODAY, _response("Math"))
+        return await cache.get(asked, TODAY)
+
+    return asyncio.run(run())
+
+
+def test_same_request_in_other_words_hits():
+    hit = _lookup(PROMPT, "go to the gym in the morning then study math")
+    assert hit is not None
+    assert hit.events[0].title == "Math"
+
+
+def test_near_miss_with_a_different_subject_does_not_hit():
+    # similar enough for the hashing embedder to clear the threshold
+    embedder = HashingEmbedder()
+    a = embedder.embed_sync(PROMPT)
+    b = embedder.embed_sync("study physics then go to the gym in the morning")
+    assert float(a @ b / ((a @ a) ** 0.5 * (b @ b) ** 0.5)) >= SemanticCache(embedder).threshold
+
+    assert _lookup(PROMPT, "study physics then go to the gym in the morning") is None
+
+
+def test_different_activity_does_not_hit():
+    assert _lookup(PROMPT, "study math then go for a run in the morning") is None
+
+
+def test_different_times_do_not_hit():
+    assert _lookup("study math 8-10 then gym", "study math 9-11 then gym") is None